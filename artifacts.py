@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from metrics import span
+
+SAFE_FILENAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+CHUNK_SIZE = 64 * 1024
+
+
+class ArtifactStore:
+    """Content-addressed directory of generated audio with age- and size-based eviction.
+
+    Files are named after the SHA-256 of their contents, so identical audio
+    is written once. A file's mtime doubles as its last-used time: it is
+    refreshed whenever the file is stored again or downloaded, and eviction
+    drops files unused for max_age_seconds, then the least recently used
+    ones until the directory fits in max_bytes.
+    """
+
+    def __init__(self, directory: str = "audio", max_bytes: int = 1024 * 1024 * 1024,
+                 max_age_seconds: float = 7 * 24 * 3600, evict_interval: float = 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._last_evicted = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, data: bytes, suffix: str = ".mp3", prefix: str = "tts") -> str:
+        """Store data under its content hash and return the file path"""
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        path = os.path.join(self.directory, f"{prefix}_{digest}{suffix}")
+        with span("file_write", bytes=len(data)):
+            try:
+                # Same content already stored: refresh its age so eviction keeps it
+                os.utime(path)
+            except FileNotFoundError:
+                # Never stored, or evicted by another thread or worker in the meantime: write it again
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        self.maybe_evict()
+        return path
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """Path of a stored file, or None if the name is unsafe or the file doesn't exist"""
+        if not SAFE_FILENAME.match(filename) or filename.endswith(".tmp"):
+            return None
+        path = os.path.join(self.directory, filename)
+        directory = os.path.realpath(self.directory)
+        if os.path.dirname(os.path.realpath(path)) != directory or not os.path.isfile(path):
+            return None
+        return path
+
+    def touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def maybe_evict(self) -> None:
+        if time.monotonic() - self._last_evicted >= self.evict_interval:
+            self.evict()
+
+    def evict(self) -> Dict[str, int]:
+        """Remove expired files, then least recently used ones beyond the size bound"""
+        with self._lock:
+            self._last_evicted = time.monotonic()
+            now = time.time()
+            files, removed, freed = [], 0, 0
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    stat_result = entry.stat()
+                    if entry.name.endswith(".tmp") and now - stat_result.st_mtime < 3600:
+                        continue
+                    files.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            for mtime, size, path in sorted(files):
+                if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+                freed += size
+
+        if removed:
+            print(f"Evicted {removed} audio artifacts ({freed} bytes)")
+        return {"removed": removed, "freed_bytes": freed, "size_bytes": total}
+
+
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_artifact_store(directory: str = "audio") -> ArtifactStore:
+    """Return the process-wide store for an output directory"""
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = _stores[directory] = ArtifactStore(
+                directory=directory,
+                max_bytes=int(os.getenv("AUDIO_MAX_BYTES", str(1024 * 1024 * 1024))),
+                max_age_seconds=float(os.getenv("AUDIO_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+            )
+        return store
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single-range Range header; None to serve the whole file.
+
+    Raises ValueError for a well-formed range that can't be satisfied.
+    """
+    if not header.startswith("bytes=") or "," in header:
+        return None
+    start, separator, end = header[len("bytes="):].strip().partition("-")
+    if not separator:
+        return None
+    if not start:
+        if not end.isdigit():
+            return None
+        if int(end) == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - int(end)), size - 1
+    if not start.isdigit() or (end and not end.isdigit()) or (end and int(end) < int(start)):
+        return None
+    first = int(start)
+    if first >= size:
+        raise ValueError("Range not satisfiable")
+    return first, min(int(end), size - 1) if end else size - 1
+
+
+class ArtifactResponse(Response):
+    """File response with ETag revalidation and single byte ranges, streamed in chunks from a worker thread"""
+
+    def __init__(self, path: str, request_headers, media_type: str, method: str = "GET"):
+        self.path = path
+        self.request_headers = request_headers
+        self.method = method
+        super().__init__(media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        size = stat_result.st_size
+        # Names are content hashes, so the name is a strong validator on its own
+        etag = f'"{os.path.splitext(os.path.basename(self.path))[0]}-{size:x}"'
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": "public, max-age=86400, immutable",
+            "content-disposition": f'attachment; filename="{os.path.basename(self.path)}"'
+        }
+
+        if_none_match = self.request_headers.get("if-none-match", "")
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored
+        client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if if_none_match and ("*" in client_tags or etag in client_tags):
+            await self._send_empty(send, 304, headers)
+            return
+
+        status, first, last = 200, 0, size - 1
+        range_header = self.request_headers.get("range")
+        if_range = self.request_headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                await self._send_empty(send, 416, {**headers, "content-range": f"bytes */{size}"})
+                return
+            if byte_range:
+                status, (first, last) = 206, byte_range
+                headers["content-range"] = f"bytes {first}-{last}/{size}"
+
+        count = last - first + 1 if size else 0
+        headers["content-type"] = self.media_type
+        headers["content-length"] = str(count)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+        })
+        if self.method == "HEAD" or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(first)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_empty(self, send: Send, status: int, headers: Dict[str, str]) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+        })
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,117 +1,285 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import os
+import json
+import time
+import asyncio
+from typing import List
 
-from models import NewsRequest
-from news_scraper import NewsScraper
-from reddit_scraper import scrape_reddit_topics
-from utils import generate_broadcast_news, text_to_audio_elevenlabs_sdk
+from settings import get_settings
 
-app = FastAPI()
-load_dotenv()
+# Load .env once, before modules that read their configuration at import (metrics)
+settings = get_settings()
+
+from models import NewsRequest, DigestRequest
+from pipeline import AUDIO_DIR, run_request, stream_pipelined_broadcast, stream_broadcast_events
+from utils import close_http_clients, normalize_topic, get_http_client, warm_up_providers
+from cache import get_cache
+from phrase_library import get_phrase_library
+from singleflight import SingleFlight
+from jobs import QueueFullError, JobNotFoundError, QUEUED, DONE, FAILED, create_job_queue
+from metrics import start_trace, render_metrics
+from prewarm import create_prewarmer
+from artifacts import ArtifactResponse, get_artifact_store
+from resilience import provider_status
+from digest import run_digest
+
+async def run_job(request):
+    """Run a queued job: a single broadcast or a digest of many"""
+    if isinstance(request, DigestRequest):
+        return await run_digest(request.requests)
+    return await run_request(request)
+
+# Broadcasts and digests run on a bounded worker pool backed by a persistent job store
+job_queue = create_job_queue(run_job)
+# Popular topics are refreshed in the background, but never while live jobs are waiting
+prewarmer = create_prewarmer(is_busy=lambda: job_queue.store.count(QUEUED) > 0)
+
+def record_topics(request: NewsRequest) -> None:
+    if prewarmer:
+        prewarmer.tracker.record(request)
+
+async def warm_up() -> None:
+    """Import provider SDKs and build their clients in the background so the first request doesn't pay for it"""
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(warm_up_providers)
+        print(f"Provider clients warmed up in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Provider warm-up failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reclaim audio left over from earlier runs before taking traffic
+    await asyncio.to_thread(get_artifact_store(AUDIO_DIR).evict)
+    get_http_client(proxied=True)
+    get_http_client()
+    warm_up_task = asyncio.create_task(warm_up()) if settings.provider_warmup else None
+    await job_queue.start()
+    if prewarmer:
+        await prewarmer.start()
+    yield
+    if prewarmer:
+        await prewarmer.stop()
+    if warm_up_task:
+        await warm_up_task
+    await job_queue.stop()
+    # Release the pooled HTTP connections shared across requests
+    await close_http_clients()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace every request so stage spans can be attributed to it"""
+    request_trace = start_trace(f"{request.method} {request.url.path}")
+    with request_trace as current:
+        response = await call_next(request)
+        # Label by endpoint rather than raw path to keep the metric cardinality bounded
+        endpoint = request.scope.get("endpoint")
+        request_trace.route = endpoint.__name__ if endpoint else "unmatched"
+        if current is not None:
+            response.headers["X-Trace-ID"] = current.trace_id
+    return response
+
+# Identical concurrent requests share a single pipeline run
+broadcast_flights = SingleFlight()
+
+def request_key(request: NewsRequest) -> tuple:
+    """Coalescing key for a request: normalised topics plus source and mode"""
+    topics = tuple(normalize_topic(topic) for topic in request.topics)
+    return (topics, request.source_type, request.pipelined)
+
+async def run_job_to_completion(request: NewsRequest) -> dict:
+    """Queue a broadcast job and wait for a worker to finish it"""
+    job_id = await job_queue.submit(request)
+    return await job_queue.wait(job_id)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: NewsRequest):
+    """Queue a broadcast job and return its id immediately"""
+    record_topics(request)
+    try:
+        job_id = await job_queue.submit(request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of a queued broadcast job"""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {key: job[key] for key in ("id", "status", "error", "created", "started", "finished")}
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """Result of a finished broadcast job (202 while it is still pending)"""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == DONE:
+        return job["result"]
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
 
 @app.post("/generate-news-audio")
 async def generate_news_audio(request: NewsRequest):
     try:
         print(f"Processing request for topics: {request.topics}")
         print(f"Source type: {request.source_type}")
-        
-        results = {}
-
-        # Scrape news
-        if request.source_type in ["news", "both"]:
-            print("Starting news scraping...")
-            news_scraper = NewsScraper()
-            results["news"] = await news_scraper.scrape_news(request.topics)
-            print(f"News scraping completed: {results['news']}")
-
-        # Scrape reddit
-        if request.source_type in ["reddit", "both"]:
-            print("Starting Reddit scraping...")
-            results["reddit"] = await scrape_reddit_topics(request.topics)
-            print(f"Reddit scraping completed: {results['reddit']}")
-
-        # Extract results
-        news_data = results.get("news", {})
-        reddit_data = results.get("reddit", {})
-
-        print("Generating broadcast summary...")
-        # Generate summary using Gemini
-        api_key = os.getenv("GEMINI_API_KEY")
-        news_summary = generate_broadcast_news(
-            api_key=api_key,
-            news_data=news_data,
-            reddit_data=reddit_data,
-            topics=request.topics
-        )
-        
-        print(f"Summary generated: {news_summary[:100]}...")
-
-        # Convert summary to audio using ElevenLabs
-        print("Starting audio conversion...")
-        audio_path = text_to_audio_elevenlabs_sdk(
-            text=news_summary,
-            voice_id="JBFqnCBsd6RMkJVDRzZb",
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128",
-            output_dir="audio"
-        )
+        record_topics(request)
 
-        if audio_path:
-            print(f"Audio conversion successful: {audio_path}")
-            return {
-                "status": "success",
-                "summary": news_summary,
-                "audio_path": audio_path
-            }
-        else:
-            print("Audio conversion failed, but returning summary")
-            # Return summary even if audio fails
-            return {
-                "status": "partial_success",
-                "summary": news_summary,
-                "audio_path": None,
-                "message": "Summary generated successfully, but audio conversion failed. You can still read the summary."
-            }
+        job = await broadcast_flights.do(request_key(request), lambda: run_job_to_completion(request))
+        if job["status"] == FAILED:
+            raise RuntimeError(job["error"])
+        return job["result"]
 
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=500, detail=f"Broadcast job lost before it finished: {str(e)}")
     except Exception as e:
         print(f"Backend error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
-@app.get("/download-audio/{filename}")
-async def download_audio(filename: str):
-    """Endpoint to download generated audio files"""
-    audio_path = f"audio/{filename}"
-    if os.path.exists(audio_path):
-        # Check if it's a text file (fallback case)
-        if filename.endswith('.txt'):
-            return FileResponse(
-                path=audio_path,
-                media_type="text/plain",
-                filename=filename
-            )
-        else:
-            return FileResponse(
-                path=audio_path,
-                media_type="audio/mpeg",
-                filename=filename
-            )
-    else:
+@app.post("/digests", status_code=202)
+async def generate_digests(request: DigestRequest):
+    """Queue a digest of many broadcasts, each unique topic segment built once; poll /jobs/{job_id}"""
+    max_requests = int(os.getenv("DIGEST_MAX_REQUESTS", "1000"))
+    if len(request.requests) > max_requests:
+        raise HTTPException(status_code=413, detail=f"At most {max_requests} broadcasts per digest; "
+                                                    f"use digest.py for larger batches")
+    for news_request in request.requests:
+        record_topics(news_request)
+    try:
+        job_id = await job_queue.submit(request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/generate-news-audio/stream")
+async def stream_news_audio(request: NewsRequest):
+    """Stream the broadcast as MP3 chunks while later topics are still being generated.
+
+    Streaming is always pipelined per topic, so the request's pipelined flag is ignored.
+    """
+    print(f"Streaming request for topics: {request.topics}")
+    record_topics(request)
+    return StreamingResponse(
+        stream_pipelined_broadcast(request),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-store"}
+    )
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+async def broadcast_event_stream(request: NewsRequest):
+    async for event in stream_broadcast_events(request):
+        yield format_sse(event)
+
+@app.post("/generate-news-audio/events")
+async def broadcast_events(request: NewsRequest):
+    """Server-Sent Events: the script as it is written and audio segments as each sentence is voiced.
+
+    Events always stream the script as it is written, so the request's pipelined flag is ignored.
+    """
+    print(f"Event stream request for topics: {request.topics}")
+    record_topics(request)
+    return StreamingResponse(
+        broadcast_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/generate-news-audio/events")
+async def broadcast_events_get(topics: List[str] = Query(...), source_type: str = "both"):
+    """GET variant of the event stream for browser EventSource clients"""
+    return await broadcast_events(NewsRequest(topics=topics, source_type=source_type))
+
+@app.get("/generate-news-audio/stream")
+async def stream_news_audio_get(topics: List[str] = Query(...), source_type: str = "both"):
+    """GET variant of the audio stream so browser audio players can use it as a source URL"""
+    return await stream_news_audio(NewsRequest(topics=topics, source_type=source_type))
+
+@app.api_route("/download-audio/{filename}", methods=["GET", "HEAD"])
+async def download_audio(filename: str, request: Request):
+    """Endpoint to download generated audio files (supports Range and ETag revalidation)"""
+    store = get_artifact_store(AUDIO_DIR)
+    audio_path = store.resolve(filename)
+    if audio_path is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
 
+    # Downloads count as use, so popular broadcasts survive eviction
+    store.touch(audio_path)
+    # Check if it's a text file (fallback case)
+    media_type = "text/plain" if filename.endswith(".txt") else "audio/mpeg"
+    return ArtifactResponse(audio_path, request.headers, media_type, request.method)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Cache hit/miss counters per pipeline stage, and for the phrase audio library"""
+    cache = get_cache()
+    library = get_phrase_library()
+    phrase_library = {"enabled": False}
+    if library:
+        phrase_library = {"enabled": True, **(await asyncio.to_thread(library.stats))}
+    if cache is None:
+        return {"enabled": False, "phrase_library": phrase_library}
+    return {"enabled": True, **(await asyncio.to_thread(cache.stats)), "phrase_library": phrase_library}
+
+@app.get("/prewarm/status")
+async def prewarm_status():
+    """Tracked topic popularity and the outcome of the last pre-warm cycle"""
+    if prewarmer is None:
+        return {"enabled": False}
+    return {"enabled": True, "topics": prewarmer.tracker.snapshot(), "last_cycle": prewarmer.last_cycle}
+
+@app.get("/providers/status")
+async def providers_status():
+    """Circuit breaker state, adaptive concurrency and call outcomes per provider in this worker"""
+    return provider_status()
+
+@app.get("/metrics")
+async def metrics():
+    """Stage duration, payload size and token histograms in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Backend is running"}
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(
-        "backend:app",
-        host="0.0.0.0",
-        port=1234,
-        reload=True
-    )
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Run the AI journalist backend")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="Run N worker processes sharing limits, cache and jobs (production mode)")
+    args = parser.parse_args()
+
+    if args.workers:
+        # Worker processes inherit this, so provider limits are enforced across all of them
+        os.environ["SHARED_STATE_ENABLED"] = "true"
+        uvicorn.run(
+            "backend:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers
+        )
+    else:
+        uvicorn.run(
+            "backend:app",
+            host=args.host,
+            port=args.port,
+            reload=True
+        )
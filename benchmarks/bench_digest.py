@@ -0,0 +1,112 @@
+"""Provider calls and wall time for many users' broadcasts: one request per user vs one digest.
+
+Users draw --topics-per-user topics from a pool of --topic-pool, so their
+topic lists overlap. The per-user baseline runs every broadcast through the
+pipelined per-topic path (with the cache off, as for users spread over a
+morning); the digest builds each unique topic once.
+
+    python benchmarks/bench_digest.py [--users 50] [--topic-pool 12] [--topics-per-user 3] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+
+from fakes import FailureInjector, FakeTTS, RecordedHTMLServer, install_fakes
+
+import pipeline
+from models import NewsRequest
+import digest as digest_module
+from digest import run_digest
+from utils import close_http_clients
+
+
+def make_requests(args) -> list:
+    rng = random.Random(7)
+    pool = [f"digest topic {index}" for index in range(args.topic_pool)]
+    return [NewsRequest(topics=rng.sample(pool, args.topics_per_user), source_type="news", pipelined=True)
+            for _ in range(args.users)]
+
+
+async def measure(name: str, run, html_server: RecordedHTMLServer, llm: FailureInjector, tts: FailureInjector,
+                  ) -> dict:
+    before = (html_server.stats()["served"], llm.calls, tts.calls)
+    started = time.perf_counter()
+    statuses = await run()
+    elapsed = time.perf_counter() - started
+    result = {
+        "elapsed_s": round(elapsed, 3),
+        "scrapes": html_server.stats()["served"] - before[0],
+        "llm_calls": llm.calls - before[1],
+        "tts_calls": tts.calls - before[2],
+        "successful_broadcasts": sum(1 for status in statuses if status == "success")
+    }
+    print(f"{name:<9} elapsed={result['elapsed_s']}s scrapes={result['scrapes']} "
+          f"llm_calls={result['llm_calls']} tts_calls={result['tts_calls']} "
+          f"ok={result['successful_broadcasts']}")
+    return result
+
+
+async def main_async(args) -> dict:
+    html_server = RecordedHTMLServer(FailureInjector(args.scrape_latency, seed=1)).start()
+    llm = FailureInjector(args.llm_latency, seed=2)
+    tts = FailureInjector(args.tts_latency, seed=3)
+    install_fakes(html_server.base_url, chat_injector=llm, tts=FakeTTS(tts))
+    pipeline.AUDIO_DIR = digest_module.AUDIO_DIR = tempfile.mkdtemp(prefix="bench_digest_audio_")
+    requests = make_requests(args)
+
+    async def per_user():
+        limiter = asyncio.Semaphore(args.concurrency)
+
+        async def one(request: NewsRequest) -> str:
+            async with limiter:
+                return (await pipeline.run_request(request))["status"]
+
+        return await asyncio.gather(*(one(request) for request in requests))
+
+    async def digest():
+        result = await run_digest(requests, args.concurrency)
+        return [broadcast["status"] for broadcast in result["results"]]
+
+    try:
+        return {
+            "config": vars(args),
+            "per_user": await measure("per_user", per_user, html_server, llm, tts),
+            "digest": await measure("digest", digest, html_server, llm, tts)
+        }
+    finally:
+        await close_http_clients()
+        html_server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--topic-pool", type=int, default=12)
+    parser.add_argument("--topics-per-user", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scrape-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--tts-latency", type=float, default=0.05)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
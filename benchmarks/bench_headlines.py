@@ -0,0 +1,151 @@
+"""Parity check and microbenchmark for the streaming headline extractor.
+
+Compares headline_extractor against the reference BeautifulSoup path
+(utils.clean_html_to_text + utils.extract_headlines) on the saved HTML
+fixtures, synthetic Google News pages and randomised markup, then times
+both. Exits non-zero if the html.parser extractor ever disagrees.
+
+    python benchmarks/bench_headlines.py [--articles 2000] [--repeat 5] [--json out.json]
+"""
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import clean_html_to_text, extract_headlines
+from headline_extractor import extract_headlines_from_html, lxml_available
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def reference_headlines(html: str) -> str:
+    return extract_headlines(clean_html_to_text(html))
+
+
+def synthetic_news_page(articles: int, seed: int = 0) -> str:
+    """A Google News-like results page with the given number of articles"""
+    rng = random.Random(seed)
+    words = ["AI", "market", "election", "climate", "chip", "startup", "policy", "court", "record",
+             "launch", "report", "deal", "&amp;", "&#8212;", "growth", "talks", "warning", "study"]
+    parts = [
+        "<!doctype html><html><head><style>.a{color:red}</style>",
+        "<script>window.data = " + json.dumps(["More"] * 50) + ";</script></head><body><main>"
+    ]
+    for index in range(articles):
+        headline = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+        parts.append(
+            f'<article class="IBr9hb"><div class="vr1PYe">Source {index % 40}</div>'
+            f'<a class="JtKRv" href="./read/{index}">{headline}</a>'
+            f'<time datetime="2025-10-14T09:12:00Z">{rng.randint(1, 23)} hours ago</time>'
+            f'<!-- tracking {index} --><div class="Dvxyu"><button>More</button></div></article>\n'
+        )
+    parts.append("</main></body></html>")
+    return "".join(parts)
+
+
+def random_markup(rng: random.Random, tokens: int = 200) -> str:
+    """Randomised, frequently malformed markup exercising tag, entity and node-boundary handling"""
+    tags = ["p", "div", "span", "b", "script", "style", "template", "rt", "rp", "br", "img", "a", "pre"]
+    texts = ["More", " More ", "Headline one", "second\nline", "&amp;", "&foo", "&#147;", "&#x2014;",
+             "&nbsp;", "  ", "\n", "tail text", "x < y", "a&b"]
+    out = []
+    for _ in range(tokens):
+        roll = rng.random()
+        tag = rng.choice(tags)
+        if roll < 0.25:
+            out.append(f"<{tag}>")
+        elif roll < 0.4:
+            out.append(f"</{tag}>")
+        elif roll < 0.45:
+            out.append(f"<{tag}/>")
+        elif roll < 0.5:
+            out.append(rng.choice(["<!-- c -->", "<![CDATA[cdata text]]>", "<!DOCTYPE html>", "<?pi x?>"]))
+        else:
+            out.append(rng.choice(texts))
+    return "".join(out)
+
+
+def check_parity(documents: dict) -> list:
+    """Return the names of documents where the html.parser extractor differs from the reference"""
+    failures = []
+    for name, html in documents.items():
+        expected = reference_headlines(html)
+        for chunk_size in (1, 7, 4096, 64 * 1024):
+            if extract_headlines_from_html(html, backend="html.parser", chunk_size=chunk_size) != expected:
+                failures.append(f"{name} (chunk_size={chunk_size})")
+                break
+    return failures
+
+
+def time_call(fn, html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2000, help="articles in the large synthetic page")
+    parser.add_argument("--random-docs", type=int, default=300, help="randomised documents for parity")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    documents = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            documents[os.path.basename(path)] = f.read()
+    documents["synthetic_small"] = synthetic_news_page(50)
+    rng = random.Random(1234)
+    for index in range(args.random_docs):
+        documents[f"random_{index}"] = random_markup(rng)
+
+    failures = check_parity(documents)
+    print(f"Parity (html.parser): {len(documents) - len(failures)}/{len(documents)} documents match")
+    for name in failures:
+        print(f"  MISMATCH: {name}")
+
+    if lxml_available():
+        lxml_matches = sum(
+            extract_headlines_from_html(html, backend="lxml") == reference_headlines(html)
+            for name, html in documents.items() if not name.startswith("random_")
+        )
+        print(f"Parity (lxml, informational): {lxml_matches}/{len(documents) - args.random_docs} fixture pages match")
+
+    page = synthetic_news_page(args.articles)
+    size_mb = len(page.encode("utf-8")) / (1024 * 1024)
+    results = {"page_mb": round(size_mb, 3), "articles": args.articles, "parity_failures": failures, "timings": {}}
+
+    candidates = {
+        "bs4_reference": reference_headlines,
+        "streaming_html_parser": lambda html: extract_headlines_from_html(html, backend="html.parser"),
+    }
+    if lxml_available():
+        candidates["streaming_lxml"] = lambda html: extract_headlines_from_html(html, backend="lxml")
+
+    print(f"\nPage: {args.articles} articles, {size_mb:.2f} MB (best of {args.repeat})")
+    baseline = None
+    for name, fn in candidates.items():
+        seconds = time_call(fn, page, args.repeat)
+        baseline = baseline or seconds
+        results["timings"][name] = {"seconds": round(seconds, 5), "mb_per_s": round(size_mb / seconds, 2)}
+        print(f"  {name:<24} {seconds * 1000:9.1f} ms  {size_mb / seconds:7.2f} MB/s  x{baseline / seconds:.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
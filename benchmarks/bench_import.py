@@ -0,0 +1,110 @@
+"""Cold-start import time of the backend, parsed from `python -X importtime`.
+
+Imports backend in fresh interpreters and reports the median cumulative
+import time, the slowest top-level packages, and whether any provider SDK
+that should load lazily (langchain, bs4, requests, numpy, elevenlabs,
+gTTS) was imported at startup. Exits non-zero if a lazy SDK is imported
+eagerly or the median exceeds --max-ms, so it can gate cold-start
+regressions.
+
+    python benchmarks/bench_import.py [--runs 5] [--module backend] [--max-ms 1500] [--json out.json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_PACKAGES = ("langchain_google_genai", "langchain_core", "bs4", "requests", "numpy", "elevenlabs", "gtts")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import, in the order they finished"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        imports.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def depth(module: str) -> int:
+    """Nesting level of an importtime entry (two spaces of indent per level)"""
+    return (len(module) - len(module.lstrip()) - 1) // 2
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-4000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level packages to report")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    totals, package_times = [], defaultdict(list)
+    eager = set()
+    for _ in range(args.runs):
+        imports = measure(args.module)
+        end = next(index for index, (module, _, _) in enumerate(imports) if module.strip() == args.module)
+        totals.append(imports[end][2] / 1000)
+        # Imports are listed as they finish, so the module's own imports are the deeper entries just before it
+        start = end
+        while start > 0 and depth(imports[start - 1][0]) > 0:
+            start -= 1
+        for module, _, cumulative in imports[start:end]:
+            name = module.strip()
+            if depth(module) == 1:
+                package_times[name].append(cumulative / 1000)
+            if name.split(".")[0] in LAZY_PACKAGES:
+                eager.add(name.split(".")[0])
+
+    slowest = sorted(((name, statistics.median(times)) for name, times in package_times.items()),
+                     key=lambda item: -item[1])[:args.top]
+    results = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "max_ms": round(max(totals), 1),
+        "slowest_imports_ms": {name: round(ms, 1) for name, ms in slowest},
+        "eager_lazy_packages": sorted(eager)
+    }
+    print(f"import {args.module}: median {results['median_ms']}ms "
+          f"(min {results['min_ms']}ms, max {results['max_ms']}ms over {args.runs} runs)")
+    for name, ms in slowest:
+        print(f"  {name:<28} {ms:8.1f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    failed = False
+    if eager:
+        print(f"Imported at startup but expected to load lazily: {', '.join(sorted(eager))}")
+        failed = True
+    if args.max_ms and results["median_ms"] > args.max_ms:
+        print(f"Median import time {results['median_ms']}ms exceeds {args.max_ms}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
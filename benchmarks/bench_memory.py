@@ -0,0 +1,163 @@
+"""Peak Python memory of scraping and extracting headlines from large pages, buffered vs streamed.
+
+The buffered path is what news scraping did before: read the whole page
+through the proxied client, then extract_headlines_from_html on it.
+The reference path adds BeautifulSoup (clean_html_to_text +
+extract_headlines). The streamed path is scrape_headlines_async, which
+parses the page as it downloads. Each mode fetches --concurrency
+synthetic Google News pages at once through the real proxied client from
+a local server, and tracemalloc reports the peak. Pages keep --articles
+headlines and are padded to size with inline scripts, as real results
+pages are, so the extracted output stays the same size. Exits non-zero if
+the streamed headlines differ from the buffered ones for a page under
+the body limit.
+
+tracemalloc only sees Python allocations, so the default html.parser
+backend gives the full picture; with --parser lxml the parser's own
+buffers (libxml2) are not counted. Tracing slows html.parser several
+times over.
+
+    python benchmarks/bench_memory.py [--sizes-mb 1 4 16] [--concurrency 8] [--parser html.parser]
+                                      [--modes buffered streamed] [--max-mb 64] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+os.environ["SCRAPE_HEDGE_ENABLED"] = "false"
+os.environ["PROVIDER_CONCURRENCY_BRIGHTDATA"] = "0"
+
+from fakes import FixtureServer
+from bench_headlines import synthetic_news_page
+
+import utils
+from headline_extractor import extract_headlines_from_html
+
+PADDING_BLOCK = "<script>window.state.push(" + json.dumps(["x" * 60] * 500) + ");</script>\n"
+
+
+def padded_news_page(size_mb: float, articles: int) -> bytes:
+    """A results page with the given number of articles, padded with script blocks to about size_mb"""
+    page = synthetic_news_page(articles)
+    blocks = max(0, int((size_mb * 1024 * 1024 - len(page)) / len(PADDING_BLOCK)))
+    return page.replace("</main>", "</main>" + PADDING_BLOCK * blocks).encode("utf-8")
+
+
+class LargePageServer(FixtureServer):
+    """Serves a prebuilt page of the requested size for /page?mb=<size>"""
+
+    def __init__(self, pages: dict):
+        super().__init__()
+        self.pages = pages
+
+    def respond(self, path: str, query: dict):
+        body = self.pages[float(query["mb"][0])]
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, body
+
+
+async def fetch_page(url: str) -> str:
+    """Read the whole page into memory, as the buffered scraper did"""
+    response = await utils.get_http_client(proxied=True).get(url)
+    response.raise_for_status()
+    return response.text
+
+
+async def buffered(url: str, max_bytes: int) -> str:
+    html = await fetch_page(url)
+    return await asyncio.to_thread(extract_headlines_from_html, html)
+
+
+async def reference(url: str, max_bytes: int) -> str:
+    html = await fetch_page(url)
+    return await asyncio.to_thread(lambda: utils.extract_headlines(utils.clean_html_to_text(html)))
+
+
+async def streamed(url: str, max_bytes: int) -> str:
+    return await utils.scrape_headlines_async(url, max_bytes)
+
+
+MODES = {"buffered": buffered, "reference": reference, "streamed": streamed}
+
+
+async def measure(mode: str, url: str, concurrency: int, max_bytes: int) -> dict:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        headlines = await asyncio.gather(*(MODES[mode](url, max_bytes) for _ in range(concurrency)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await utils.close_http_clients()
+    return {
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "seconds": round(time.perf_counter() - started, 3),
+        "headlines": len(headlines[0].splitlines()),
+        "output": headlines[0]
+    }
+
+
+async def main_async(args) -> dict:
+    # Pages are built before tracing starts so only the fetch and parse are counted
+    pages = {size: padded_news_page(size, args.articles) for size in args.sizes_mb}
+    server = LargePageServer(pages).start()
+    utils.get_brightdata_proxy_url = lambda: server.base_url
+    max_bytes = int(args.max_mb * 1024 * 1024)
+
+    results = {"config": vars(args), "sizes": {}}
+    mismatches = []
+    try:
+        for size in args.sizes_mb:
+            url = f"{server.base_url}/page?mb={size}"
+            row = {"page_mb": round(len(pages[size]) / 1024 / 1024, 2)}
+            for mode in args.modes:
+                row[mode] = await measure(mode, url, args.concurrency, max_bytes)
+            comparable = len(pages[size]) <= max_bytes and "buffered" in row and "streamed" in row
+            if comparable and row["buffered"]["output"] != row["streamed"]["output"]:
+                mismatches.append(size)
+            for mode in args.modes:
+                del row[mode]["output"]
+            results["sizes"][str(size)] = row
+            print(f"page={row['page_mb']:>6}MB x{args.concurrency}  " + "  ".join(
+                f"{mode}: peak={row[mode]['peak_mb']}MB {row[mode]['seconds']}s" for mode in args.modes))
+    finally:
+        server.stop()
+
+    results["mismatched_sizes"] = mismatches
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--articles", type=int, default=100, help="Headlines per page")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages fetched at once")
+    parser.add_argument("--parser", default="html.parser", choices=["html.parser", "lxml"])
+    parser.add_argument("--modes", nargs="+", default=["buffered", "streamed"], choices=list(MODES),
+                        help="reference (BeautifulSoup) is very slow under tracemalloc")
+    parser.add_argument("--max-mb", type=float, default=64, help="Streamed body limit (SCRAPE_MAX_BYTES)")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    os.environ["HEADLINE_PARSER"] = args.parser
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    if results["mismatched_sizes"]:
+        print(f"Streamed headlines differ from buffered for page sizes: {results['mismatched_sizes']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
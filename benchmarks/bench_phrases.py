@@ -0,0 +1,135 @@
+"""Characters billed and synthesis time with and without the phrase audio library.
+
+Synthesizes broadcast scripts shaped like the ones BROADCAST_SYSTEM_PROMPT
+asks for ("According to official reports, ...", "Meanwhile, online
+discussions on Reddit reveal...", "To wrap up this segment, ...") with a
+fake TTS provider that has per-call latency and per-character cost. Every
+run uses new script text, so only the phrase library can be reused. Modes:
+off (PHRASE_LIBRARY_ENABLED=false), cold (empty library: phrases are voiced
+inline and once more on their own to fill it) and warm (library filled by
+earlier runs). Checks that every output is a clean run of MP3
+frames.
+
+    python benchmarks/bench_phrases.py [--runs 5] [--topics 3] [--tts-latency 0.3] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+os.environ["PHRASE_LIBRARY_DIR"] = tempfile.mkdtemp(prefix="bench_phrase_library_")
+
+from fakes import FailureInjector, FakeTTS
+
+import tts
+from mp3 import iter_frames
+
+WORDS = ["officials", "market", "election", "climate", "chip", "startup", "policy", "court", "record", "launch",
+         "report", "deal", "growth", "talks", "warning", "study", "city", "council", "budget", "users"]
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 18))).capitalize() + "."
+
+
+def broadcast_script(topics: int, seed: str) -> str:
+    """A script following the broadcast prompt's structure, with fresh wording for every seed"""
+    rng = random.Random(seed)
+    segments = []
+    for _ in range(topics):
+        segments.append(
+            f"According to official reports, {sentence(rng).lower()} "
+            + " ".join(sentence(rng) for _ in range(3))
+            + "\n\nMeanwhile, online discussions on Reddit reveal... "
+            + " ".join(sentence(rng) for _ in range(3))
+            + f"\n\nTo wrap up this segment, {sentence(rng).lower()}"
+        )
+    return "\n\n".join(segments)
+
+
+class CountingTTS(FakeTTS):
+    """FakeTTS that records the calls and characters it was billed for"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.characters = 0
+
+    def __call__(self, text: str, *args) -> bytes:
+        self.calls += 1
+        self.characters += len(text)
+        return super().__call__(text, *args)
+
+
+def clean_frames(audio: bytes) -> bool:
+    """True when the audio is nothing but back-to-back MP3 frames"""
+    return sum(length for _, length in iter_frames(audio)) == len(audio)
+
+
+def run_mode(mode: str, args) -> dict:
+    os.environ["PHRASE_LIBRARY_ENABLED"] = "false" if mode == "off" else "true"
+    runs = []
+    for run in range(args.runs):
+        fake = CountingTTS(FailureInjector(args.tts_latency, seed=run),
+                           seconds_per_1k_chars=args.tts_seconds_per_1k_chars)
+        tts.synthesize_elevenlabs = fake
+        script = broadcast_script(args.topics, seed=f"{mode}-{run}")
+        started = time.perf_counter()
+        audio = tts.synthesize_text(script, api_key="bench")
+        runs.append({
+            "seconds": time.perf_counter() - started,
+            "script_characters": len(script),
+            "billed_characters": fake.characters,
+            "calls": fake.calls,
+            "clean_frames": clean_frames(audio)
+        })
+    return {
+        "median_seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+        "billed_characters": sum(run["billed_characters"] for run in runs),
+        "script_characters": sum(run["script_characters"] for run in runs),
+        "calls": sum(run["calls"] for run in runs),
+        "clean_frames": all(run["clean_frames"] for run in runs)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--topics", type=int, default=3)
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="Seconds per TTS call")
+    parser.add_argument("--tts-seconds-per-1k-chars", type=float, default=0.5)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args)}
+    # cold runs a single broadcast so it shows the one-off cost of filling the library
+    for mode in ("off", "cold", "warm"):
+        mode_args = argparse.Namespace(**{**vars(args), "runs": 1 if mode == "cold" else args.runs})
+        results[mode] = run_mode(mode, mode_args)
+        summary = results[mode]
+        print(f"{mode:<5} median={summary['median_seconds']}s billed={summary['billed_characters']}/"
+              f"{summary['script_characters']} chars calls={summary['calls']} clean_frames={summary['clean_frames']}")
+
+    if results["warm"]["script_characters"]:
+        saved = 1 - (results["warm"]["billed_characters"] / results["warm"]["script_characters"])
+        print(f"warm library: {saved:.1%} fewer characters billed")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    if not all(results[mode]["clean_frames"] for mode in ("off", "cold", "warm")):
+        print("Spliced audio is not a clean run of MP3 frames")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
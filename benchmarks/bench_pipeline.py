@@ -0,0 +1,217 @@
+"""Offline end-to-end benchmark for the broadcast API.
+
+Runs the real backend.app in-process through httpx's ASGI transport, with
+BrightData, Reddit, Gemini and ElevenLabs replaced by the local fakes in
+benchmarks/fakes.py. Every (concurrency, topic count) combination runs in a
+fresh subprocess so peak RSS and in-memory state don't leak between runs.
+Reports requests/second, end-to-end and per-stage p50/p95/p99, error counts
+and peak RSS as JSON.
+
+    python benchmarks/bench_pipeline.py --concurrency 1,4,16 --topics 1,3 --requests 32 \
+        --llm-latency 0.8 --tts-latency 0.5 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+    return {"count": len(ordered), "p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 4)}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_level(args) -> Dict:
+    """Drive one concurrency/topic-count combination against the in-process app"""
+    import httpx
+    import metrics
+    import pipeline
+    from fakes import FailureInjector, FakeTTS, RecordedHTMLServer, RedditFixtureServer, install_fakes
+
+    html_server = RecordedHTMLServer(
+        FailureInjector(args.scrape_latency, args.scrape_latency / 4, args.scrape_failure_rate, seed=1)
+    ).start()
+    reddit_server = RedditFixtureServer(
+        FailureInjector(args.scrape_latency, args.scrape_latency / 4, args.scrape_failure_rate, seed=5)
+    ).start()
+    install_fakes(
+        html_server.base_url,
+        chat_injector=FailureInjector(args.llm_latency, args.llm_latency / 4, args.llm_failure_rate, seed=2),
+        tts=FakeTTS(FailureInjector(args.tts_latency, args.tts_latency / 4, args.tts_failure_rate, seed=3),
+                    seconds_per_1k_chars=args.tts_seconds_per_1k_chars),
+        gtts=FakeTTS(FailureInjector(args.tts_latency, args.tts_latency / 4, seed=4)),
+        reddit_base_url=reddit_server.base_url
+    )
+    pipeline.AUDIO_DIR = tempfile.mkdtemp(prefix="bench_audio_")
+
+    # Keep every raw stage duration so percentiles are exact rather than bucketed
+    stage_samples = defaultdict(list)
+    observe_stage = metrics.STAGE_DURATION.observe
+
+    def record_stage(stage: str, value: float) -> None:
+        stage_samples[stage].append(value)
+        observe_stage(stage, value)
+
+    metrics.STAGE_DURATION.observe = record_stage
+
+    import backend
+
+    latencies, statuses = [], defaultdict(int)
+    request_index = 0
+
+    def next_request() -> Dict:
+        nonlocal request_index
+        request_index += 1
+        offset = 0 if args.shared_topics else request_index * args.topic_count
+        return {
+            "topics": [f"topic {offset + index}" for index in range(args.topic_count)],
+            "source_type": args.source_type,
+            "pipelined": args.mode == "pipelined"
+        }
+
+    async def client_loop(client: httpx.AsyncClient, remaining: List[int]) -> None:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.post("/generate-news-audio", json=next_request())
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=backend.app)
+    try:
+        async with backend.lifespan(backend.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                remaining = [args.requests]
+                started = time.perf_counter()
+                await asyncio.gather(*(client_loop(client, remaining) for _ in range(args.concurrency_level)))
+                elapsed = time.perf_counter() - started
+    finally:
+        html_server.stop()
+        reddit_server.stop()
+
+    return {
+        "concurrency": args.concurrency_level,
+        "topics": args.topic_count,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items(), key=str)},
+        "latency_s": percentiles(latencies),
+        "stages_s": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_in_subprocess(args, concurrency: int, topics: int) -> Dict:
+    command = [sys.executable, os.path.abspath(__file__), "--run-one",
+               "--concurrency-level", str(concurrency), "--topic-count", str(topics)]
+    for name in ("requests", "source_type", "mode", "scrape_latency", "llm_latency", "tts_latency",
+                 "tts_seconds_per_1k_chars", "scrape_failure_rate", "llm_failure_rate", "tts_failure_rate"):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    if args.shared_topics:
+        command.append("--shared-topics")
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    env = dict(
+        os.environ,
+        CACHE_ENABLED="true" if args.cache else "false",
+        CACHE_DIR=os.path.join(workdir, "cache"),
+        PHRASE_LIBRARY_DIR=os.path.join(workdir, "phrase_audio"),
+        JOBS_DB=os.path.join(workdir, "jobs.db"),
+        JOB_WORKERS=str(args.job_workers or concurrency),
+        JOB_QUEUE_DEPTH=str(max(args.requests, 1)),
+        METRICS_ENABLED="true",
+        GEMINI_API_KEY="bench",
+        ELEVENLABS_API_KEY="bench",
+        BRIGHTDATA_USER="bench",
+        BRIGHTDATA_PASS="bench"
+    )
+    completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{completed.stderr[-4000:]}")
+    # The app prints progress to stdout; the result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 4, 16])
+    parser.add_argument("--topics", type=parse_list, default=[1, 3])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per combination")
+    parser.add_argument("--source-type", default="news", choices=["news", "reddit", "both"])
+    parser.add_argument("--mode", default="sync", choices=["sync", "pipelined"])
+    parser.add_argument("--shared-topics", action="store_true",
+                        help="Reuse the same topics in every request (exercises coalescing)")
+    parser.add_argument("--cache", action="store_true", help="Leave the disk cache enabled")
+    parser.add_argument("--job-workers", type=int, default=0, help="Defaults to the concurrency level")
+    parser.add_argument("--scrape-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--tts-latency", type=float, default=0.4)
+    parser.add_argument("--tts-seconds-per-1k-chars", type=float, default=0.2)
+    parser.add_argument("--scrape-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tts-failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--concurrency-level", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--topic-count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(asyncio.run(run_level(args))))
+        return
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("json", "run_one", "concurrency_level", "topic_count")}
+    runs = []
+    for topics in args.topics:
+        for concurrency in args.concurrency:
+            result = run_in_subprocess(args, concurrency, topics)
+            runs.append(result)
+            latency = result["latency_s"]
+            print(f"topics={topics:<3} concurrency={concurrency:<4} "
+                  f"{result['requests_per_second']:>7} req/s  "
+                  f"p50={latency.get('p50')}s p95={latency.get('p95')}s p99={latency.get('p99')}s  "
+                  f"rss={result['peak_rss_mb']}MB  status={result['status_codes']}")
+
+    results = {"config": config, "runs": runs}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Check and time the Reddit ingestion path against the local fixture API.
+
+Verifies that repeat fetches only pull posts newer than the last one seen,
+that 429 responses are retried after Retry-After, and compares concurrent
+multi-topic ingestion with fetching the same topics one after another.
+Exits non-zero if a check fails.
+
+    python benchmarks/bench_reddit.py [--topics 8] [--latency 0.1] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+
+from fakes import FailureInjector, RedditFixtureServer
+
+import reddit_scraper
+from utils import close_http_clients
+
+
+async def check_incremental(server: RedditFixtureServer) -> dict:
+    before = dict(server.requests)
+    first = await reddit_scraper.process_topic_simple("incremental topic")
+    after_first = dict(server.requests)
+
+    server.publish("incremental topic", 2)
+    second = await reddit_scraper.process_topic_simple("incremental topic")
+    after_second = dict(server.requests)
+
+    new_comment_fetches = after_second["comments"] - after_first["comments"]
+    ok = new_comment_fetches == 2 and second != first and "Discussion" in second
+    return {
+        "ok": ok,
+        "first_fetch_comment_requests": after_first["comments"] - before["comments"],
+        "second_fetch_comment_requests": new_comment_fetches
+    }
+
+
+async def check_rate_limit(server: RedditFixtureServer) -> dict:
+    server.rate_limit_rate = 0.5
+    try:
+        summary = await reddit_scraper.process_topic_simple("rate limited topic")
+    finally:
+        server.rate_limit_rate = 0.0
+    return {"ok": "Discussion" in summary, "rate_limited_responses": server.requests["rate_limited"]}
+
+
+async def time_topics(topics: list) -> dict:
+    started = time.perf_counter()
+    for topic in topics:
+        await reddit_scraper.process_topic_simple(f"serial {topic}")
+    serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await reddit_scraper.scrape_reddit_topics([f"concurrent {topic}" for topic in topics])
+    concurrent = time.perf_counter() - started
+    return {"topics": len(topics), "serial_s": round(serial, 3), "concurrent_s": round(concurrent, 3),
+            "speedup": round(serial / concurrent, 2)}
+
+
+async def run(args) -> dict:
+    server = RedditFixtureServer(FailureInjector(latency=args.latency)).start()
+    os.environ["REDDIT_BASE_URL"] = server.base_url
+    try:
+        results = {
+            "incremental": await check_incremental(server),
+            "rate_limit": await check_rate_limit(server),
+            "timing": await time_topics([f"topic {index}" for index in range(args.topics)])
+        }
+    finally:
+        await close_http_clients()
+        server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fixture API latency per request")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if not (results["incremental"]["ok"] and results["rate_limit"]["ok"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Tail latency of scraping and TTS during provider incidents, with and without the resilience layer.
+
+Scenarios, each run with breakers/hedging off and then on:
+  proxy_outage     the BrightData proxy answers 502 after --outage-latency; pages fall back to direct fetches
+  elevenlabs_down  ElevenLabs fails after --outage-latency; audio falls back to gTTS
+  slow_proxy       --tail-rate of proxy requests take --tail-latency; hedging races a second request
+Exits non-zero if the resilient run isn't faster at p95 in every scenario.
+
+    python benchmarks/bench_resilience.py [--requests 100] [--concurrency 4] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+
+from bench_pipeline import percentiles
+from fakes import FailureInjector, FakeTTS, RecordedHTMLServer, install_fakes
+
+import utils
+import resilience
+from tts import synthesize_text
+
+
+class TailInjector(FailureInjector):
+    """Fast responses with an occasional slow one"""
+
+    def __init__(self, latency: float, tail_latency: float, tail_rate: float, seed: int = 0):
+        super().__init__(latency, seed=seed)
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+
+    def next_delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.tail_latency if self._rng.random() < self.tail_rate else self.latency
+
+
+def configure(resilient: bool) -> None:
+    os.environ["CIRCUIT_FAILURE_THRESHOLD"] = "5" if resilient else str(10 ** 9)
+    os.environ["CIRCUIT_COOLDOWN_SECONDS"] = "60"
+    os.environ["SCRAPE_HEDGE_ENABLED"] = "true" if resilient else "false"
+    os.environ["SCRAPE_HEDGE_SECONDS"] = "0.2"
+    resilience._guards.clear()
+
+
+async def run_calls(call, requests: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = [requests]
+
+    async def loop():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            await call(remaining[0])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return {"elapsed_s": round(time.perf_counter() - started, 3), "latency_s": percentiles(latencies)}
+
+
+async def scenario(name: str, proxy: RecordedHTMLServer, direct: RecordedHTMLServer,
+                   elevenlabs: FakeTTS, args) -> dict:
+    install_fakes(direct.base_url, chat_injector=FailureInjector(), tts=elevenlabs,
+                  gtts=FakeTTS(FailureInjector(0.05, seed=4)))
+    utils.get_brightdata_proxy_url = lambda: proxy.base_url
+
+    async def call(index: int) -> None:
+        if name == "elevenlabs_down":
+            await asyncio.to_thread(synthesize_text, f"Segment {index}. " * 20)
+        else:
+            await utils.scrape_headlines_async(utils.generate_valid_news_url(f"topic {index}"))
+
+    results = {}
+    for resilient in (False, True):
+        configure(resilient)
+        await utils.close_http_clients()
+        run = await run_calls(call, args.requests, args.concurrency)
+        run["providers"] = resilience.provider_status()
+        results["resilient" if resilient else "baseline"] = run
+        print(f"{name:<16} {'resilient' if resilient else 'baseline':<9} elapsed={run['elapsed_s']}s "
+              f"p50={run['latency_s']['p50']}s p95={run['latency_s']['p95']}s")
+    results["ok"] = results["resilient"]["latency_s"]["p95"] < results["baseline"]["latency_s"]["p95"]
+    return results
+
+
+async def main_async(args) -> dict:
+    direct = RecordedHTMLServer(FailureInjector(0.02, seed=1)).start()
+    down_proxy = RecordedHTMLServer(FailureInjector(args.outage_latency, failure_rate=1.0, seed=2)).start()
+    slow_proxy = RecordedHTMLServer(TailInjector(0.05, args.tail_latency, args.tail_rate, seed=3)).start()
+    try:
+        return {
+            "proxy_outage": await scenario("proxy_outage", down_proxy, direct, FakeTTS(), args),
+            "elevenlabs_down": await scenario(
+                "elevenlabs_down", direct, direct,
+                FakeTTS(FailureInjector(args.outage_latency, failure_rate=1.0, seed=5)), args),
+            "slow_proxy": await scenario("slow_proxy", slow_proxy, direct, FakeTTS(), args)
+        }
+    finally:
+        await utils.close_http_clients()
+        for server in (direct, down_proxy, slow_proxy):
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--outage-latency", type=float, default=1.0,
+                        help="Seconds a failing provider takes to fail (a stand-in for its timeout)")
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--tail-rate", type=float, default=0.1)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    failed = [name for name, result in results.items() if not result["ok"]]
+    if failed:
+        print(f"Resilient p95 not better in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Time to first script text and first audio: blocking broadcast vs token-streamed generation.
+
+The blocking path (run_broadcast) only has text and audio once Gemini has
+returned the whole script and TTS has voiced all of it. The streaming path
+(stream_broadcast_events) voices each sentence as soon as it is written.
+The fake LLM emits --tokens-per-second words after --llm-latency. Reddit
+is the default source because news scraping makes its own (non-streamed)
+summary calls, which both paths pay equally.
+
+    python benchmarks/bench_streaming.py [--runs 3] [--topics 2] [--tokens-per-second 40] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ["CACHE_ENABLED"] = "false"
+
+from fakes import FailureInjector, FakeChatModel, FakeTTS, RecordedHTMLServer, RedditFixtureServer, install_fakes
+
+import pipeline
+from models import NewsRequest
+from utils import close_http_clients
+
+
+async def blocking_run(request: NewsRequest) -> dict:
+    started = time.perf_counter()
+    response = await pipeline.run_broadcast(request)
+    total = time.perf_counter() - started
+    return {"first_text_s": total, "first_audio_s": total, "total_s": total, "status": response["status"]}
+
+
+async def streaming_run(request: NewsRequest) -> dict:
+    started = time.perf_counter()
+    first_text = first_audio = None
+    audio_events = 0
+    async for event in pipeline.stream_broadcast_events(request):
+        elapsed = time.perf_counter() - started
+        if event["event"] == "script" and first_text is None:
+            first_text = elapsed
+        if event["event"] == "audio":
+            audio_events += 1
+            first_audio = first_audio or elapsed
+        if event["event"] == "done":
+            return {"first_text_s": first_text, "first_audio_s": first_audio, "total_s": elapsed,
+                    "status": event["data"]["status"], "audio_segments": audio_events}
+    raise RuntimeError("Event stream ended without a done event")
+
+
+def summarise(runs: list) -> dict:
+    return {key: round(statistics.median(run[key] for run in runs), 3)
+            for key in ("first_text_s", "first_audio_s", "total_s")} | {"statuses": [run["status"] for run in runs]}
+
+
+async def main_async(args) -> dict:
+    html_server = RecordedHTMLServer(FailureInjector(args.scrape_latency, seed=1)).start()
+    reddit_server = RedditFixtureServer(FailureInjector(args.scrape_latency, seed=5)).start()
+    install_fakes(html_server.base_url, chat_injector=FailureInjector(args.llm_latency, seed=2),
+                  tts=FakeTTS(FailureInjector(args.tts_latency, seed=3),
+                              seconds_per_1k_chars=args.tts_seconds_per_1k_chars),
+                  reddit_base_url=reddit_server.base_url)
+    FakeChatModel.seconds_per_token = 1 / args.tokens_per_second
+    pipeline.AUDIO_DIR = tempfile.mkdtemp(prefix="bench_streaming_audio_")
+
+    results = {"config": vars(args), "blocking": [], "streaming": []}
+    try:
+        for run in range(args.runs):
+            request = NewsRequest(topics=[f"streaming topic {run} {index}" for index in range(args.topics)],
+                                  source_type=args.source_type)
+            results["blocking"].append(await blocking_run(request))
+            request = NewsRequest(topics=[f"streaming topic {run} {index} again" for index in range(args.topics)],
+                                  source_type=args.source_type)
+            results["streaming"].append(await streaming_run(request))
+    finally:
+        await close_http_clients()
+        html_server.stop()
+        reddit_server.stop()
+
+    results["blocking_median"] = summarise(results["blocking"])
+    results["streaming_median"] = summarise(results["streaming"])
+    for mode in ("blocking", "streaming"):
+        median = results[f"{mode}_median"]
+        print(f"{mode:<9} first_text={median['first_text_s']}s first_audio={median['first_audio_s']}s "
+              f"total={median['total_s']}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--topics", type=int, default=2)
+    parser.add_argument("--source-type", default="reddit", choices=["news", "reddit", "both"])
+    parser.add_argument("--scrape-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds to the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--tts-seconds-per-1k-chars", type=float, default=0.5)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
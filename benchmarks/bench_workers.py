@@ -0,0 +1,177 @@
+"""Throughput of the broadcast API under uvicorn with 1..N worker processes.
+
+Starts the fixture servers in this process, then for each worker count
+launches `uvicorn fake_app:app --workers N` with shared limit state enabled
+and drives it with concurrent clients. Besides req/s and p50/p95 it reports
+the most concurrent requests the fake BrightData proxy ever saw, which must
+stay within PROVIDER_CONCURRENCY_BRIGHTDATA however many workers run.
+
+    python benchmarks/bench_workers.py --workers 1,2,4 --concurrency 32 --requests 128 \
+        --brightdata-concurrency 4 --json workers.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import percentiles, parse_list  # noqa: E402
+from fakes import FailureInjector, RecordedHTMLServer, RedditFixtureServer  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+async def drive(base_url: str, args) -> Dict:
+    latencies, statuses = [], defaultdict(int)
+    remaining = [args.requests]
+    counter = [0]
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            counter[0] += 1
+            body = {"topics": [f"worker topic {counter[0] * args.topics + index}" for index in range(args.topics)],
+                    "source_type": args.source_type}
+            started = time.perf_counter()
+            try:
+                response = await client.post("/generate-news-audio", json=body)
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items(), key=str)},
+        "latency_s": percentiles(latencies)
+    }
+
+
+def run_workers(args, workers: int) -> Dict:
+    html_server = RecordedHTMLServer(FailureInjector(args.scrape_latency, args.scrape_latency / 4, seed=1)).start()
+    reddit_server = RedditFixtureServer(FailureInjector(args.scrape_latency, args.scrape_latency / 4, seed=5)).start()
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    port = free_port()
+    env = dict(
+        os.environ,
+        BENCH_HTML_URL=html_server.base_url,
+        BENCH_REDDIT_URL=reddit_server.base_url,
+        BENCH_LLM_LATENCY=str(args.llm_latency),
+        BENCH_TTS_LATENCY=str(args.tts_latency),
+        SHARED_STATE_ENABLED="true",
+        SHARED_STATE_DB=os.path.join(workdir, "shared_state.db"),
+        PROVIDER_CONCURRENCY_BRIGHTDATA=str(args.brightdata_concurrency),
+        CACHE_ENABLED="false",
+        CACHE_DIR=os.path.join(workdir, "cache"),
+        PHRASE_LIBRARY_DIR=os.path.join(workdir, "phrase_audio"),
+        JOBS_DB=os.path.join(workdir, "jobs.db"),
+        JOB_WORKERS=str(max(1, args.concurrency // workers)),
+        JOB_QUEUE_DEPTH=str(max(args.requests, 1)),
+        GEMINI_API_KEY="bench",
+        ELEVENLABS_API_KEY="bench",
+        BRIGHTDATA_USER="bench",
+        BRIGHTDATA_PASS="bench"
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_app:app", "--app-dir", BENCH_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_healthy(base_url))
+        result = asyncio.run(drive(base_url, args))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        html_server.stop()
+        reddit_server.stop()
+
+    scrape_stats = html_server.stats()
+    return {
+        "workers": workers,
+        **result,
+        "brightdata_requests": scrape_stats["served"],
+        "brightdata_max_in_flight": scrape_stats["max_in_flight"],
+        "brightdata_limit": args.brightdata_concurrency
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=parse_list, default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=128, help="Requests per worker count")
+    parser.add_argument("--topics", type=int, default=1, help="Topics per request")
+    parser.add_argument("--source-type", default="news", choices=["news", "reddit", "both"])
+    parser.add_argument("--brightdata-concurrency", type=int, default=4,
+                        help="Global BrightData concurrency limit shared by all workers")
+    parser.add_argument("--scrape-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--tts-latency", type=float, default=0.4)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    runs: List[Dict] = []
+    for workers in args.workers:
+        result = run_workers(args, workers)
+        runs.append(result)
+        latency = result["latency_s"]
+        print(f"workers={workers:<3} {result['requests_per_second']:>7} req/s  "
+              f"p50={latency.get('p50')}s p95={latency.get('p95')}s  "
+              f"brightdata in flight={result['brightdata_max_in_flight']}/{result['brightdata_limit']}  "
+              f"status={result['status_codes']}")
+        if result["brightdata_max_in_flight"] > args.brightdata_concurrency:
+            print("  BrightData concurrency exceeded the shared limit")
+
+    results = {"config": vars(args), "runs": runs}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""backend.app wired to the local fakes, for benchmarks that run the app under a real uvicorn.
+
+Fixture server URLs and fake latencies come from the environment, so every
+uvicorn worker process installs the same fakes:
+
+    BENCH_HTML_URL=http://127.0.0.1:8001 BENCH_REDDIT_URL=http://127.0.0.1:8002 \
+        python -m uvicorn fake_app:app --app-dir benchmarks --workers 4
+"""
+import os
+
+from fakes import FailureInjector, FakeTTS, install_fakes
+
+install_fakes(
+    os.environ["BENCH_HTML_URL"],
+    chat_injector=FailureInjector(float(os.getenv("BENCH_LLM_LATENCY", "0.8")),
+                                  float(os.getenv("BENCH_LLM_LATENCY", "0.8")) / 4, seed=os.getpid()),
+    tts=FakeTTS(FailureInjector(float(os.getenv("BENCH_TTS_LATENCY", "0.4")), seed=os.getpid()),
+                seconds_per_1k_chars=float(os.getenv("BENCH_TTS_SECONDS_PER_1K_CHARS", "0.2"))),
+    gtts=FakeTTS(FailureInjector(float(os.getenv("BENCH_TTS_LATENCY", "0.4")), seed=os.getpid())),
+    reddit_base_url=os.getenv("BENCH_REDDIT_URL")
+)
+
+from backend import app  # noqa: E402
@@ -0,0 +1,341 @@
+"""Local stand-ins for BrightData, Gemini and ElevenLabs used by the offline benchmarks.
+
+Each fake has configurable latency and failure injection so throughput and
+tail latency can be measured without paying for proxy, LLM or TTS calls.
+"""
+import os
+import sys
+import json
+import zlib
+import glob
+import time
+import random
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+# Keep phrase audio recorded by benchmark runs out of the working directory
+os.environ.setdefault("PHRASE_LIBRARY_DIR", tempfile.mkdtemp(prefix="bench_phrase_library_"))
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz frame header: every frame is 417 bytes (~26 ms of audio)
+MP3_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x64])
+MP3_FRAME_SIZE = 417
+
+
+class FailureInjector:
+    """Shared latency/failure settings for a fake provider"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+            self.failures += failed
+            return failed
+
+
+class FixtureServer:
+    """Threaded local HTTP server; subclasses implement respond(path, query)"""
+
+    def __init__(self, injector: FailureInjector = None, host: str = "127.0.0.1"):
+        self.injector = injector or FailureInjector()
+        self._server = ThreadingHTTPServer((host, 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._in_flight_lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.served = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str, query: dict):
+        """Return (status, headers, body) for a GET request"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Requests served and the most that were ever in flight at once (also served at /_stats)"""
+        with self._in_flight_lock:
+            return {"served": self.served, "max_in_flight": self.max_in_flight}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/_stats":
+                    self._send(200, {"Content-Type": "application/json"}, json.dumps(server.stats()).encode())
+                    return
+                with server._in_flight_lock:
+                    server.in_flight += 1
+                    server.served += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.injector.next_delay())
+                    if server.injector.should_fail():
+                        self.send_error(502, "Injected upstream failure")
+                        return
+                    self._send(*server.respond(url.path, parse_qs(url.query)))
+                finally:
+                    with server._in_flight_lock:
+                        server.in_flight -= 1
+
+            def _send(self, status: int, headers: dict, body: bytes):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (e.g. the losing side of a hedged request)
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class RecordedHTMLServer(FixtureServer):
+    """HTTP server replaying saved Google News pages for any search URL.
+
+    It also accepts absolute-form proxy requests, so it can stand in for the
+    BrightData super-proxy and exercise the real proxied fetch path.
+    """
+
+    def __init__(self, injector: FailureInjector = None, fixtures_dir: str = FIXTURES_DIR, host: str = "127.0.0.1"):
+        super().__init__(injector, host)
+        pages = []
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+        self.pages = pages
+
+    def respond(self, path: str, query: dict):
+        keyword = query.get("q", [""])[0]
+        # crc32 rather than hash() so a topic gets the same page whatever PYTHONHASHSEED is
+        page = self.pages[zlib.crc32(keyword.encode("utf-8")) % len(self.pages)] if self.pages else "<html></html>"
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, page.encode("utf-8")
+
+
+class RedditFixtureServer(FixtureServer):
+    """Stand-in for the Reddit JSON API serving /search.json and /comments/<id>.json.
+
+    Each topic starts with posts_per_topic posts; publish() adds newer ones so
+    incremental fetching can be checked. rate_limit_rate answers that share of
+    requests with 429 and a Retry-After header.
+    """
+
+    def __init__(self, injector: FailureInjector = None, posts_per_topic: int = 25, comments_per_post: int = 8,
+                 rate_limit_rate: float = 0.0, retry_after: str = "0", host: str = "127.0.0.1"):
+        super().__init__(injector, host)
+        self.posts_per_topic = posts_per_topic
+        self.comments_per_post = comments_per_post
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(5)
+        self._lock = threading.Lock()
+        self._posts = {}
+        self._next_id = 1
+        self.requests = {"search": 0, "comments": 0, "rate_limited": 0}
+
+    def _topic_posts(self, topic: str) -> list:
+        if topic not in self._posts:
+            self._posts[topic] = []
+            self._publish(topic, self.posts_per_topic)
+        return self._posts[topic]
+
+    def _publish(self, topic: str, count: int) -> None:
+        for _ in range(count):
+            post_id = format(self._next_id, "x")
+            self._next_id += 1
+            self._posts[topic].insert(0, {
+                "id": post_id,
+                "title": f"Discussion {post_id} about {topic}",
+                "subreddit": "news",
+                "score": self._rng.randint(1, 5000),
+                "num_comments": self.comments_per_post,
+                "created_utc": time.time()
+            })
+
+    def publish(self, topic: str, count: int = 1) -> None:
+        """Add newer posts to a topic"""
+        with self._lock:
+            self._topic_posts(topic)
+            self._publish(topic, count)
+
+    def respond(self, path: str, query: dict):
+        with self._lock:
+            if self._rng.random() < self.rate_limit_rate:
+                self.requests["rate_limited"] += 1
+                return 429, {"Retry-After": self.retry_after}, b"{}"
+
+            limit = int(query.get("limit", ["25"])[0])
+            if path == "/search.json":
+                self.requests["search"] += 1
+                posts = self._topic_posts(query.get("q", [""])[0])
+                before = query.get("before", [""])[0].replace("t3_", "")
+                if before:
+                    known = [post["id"] for post in posts]
+                    posts = posts[:known.index(before)] if before in known else posts
+                children = [{"kind": "t3", "data": post} for post in posts[:limit]]
+                payload = {"kind": "Listing", "data": {"children": children}}
+            elif path.startswith("/comments/"):
+                self.requests["comments"] += 1
+                post_id = path[len("/comments/"):].split(".")[0]
+                comments = [{"kind": "t1", "data": {"body": f"Top comment {index} on post {post_id}",
+                                                     "score": 100 - index}}
+                            for index in range(min(limit, self.comments_per_post))]
+                payload = [{"kind": "Listing", "data": {"children": []}},
+                           {"kind": "Listing", "data": {"children": comments}}]
+            else:
+                return 404, {"Content-Type": "application/json"}, b"{}"
+        return 200, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, content: str, input_tokens: int, output_tokens: int):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+
+
+class FakeChatModel:
+    """Drop-in for ChatGoogleGenerativeAI returning broadcast-like scripts after a configurable delay"""
+
+    injector = FailureInjector()
+    sentences_per_topic = 8
+    # Generation time per word on top of the injector's latency, so streaming can start before the end
+    seconds_per_token = 0.0
+
+    def __init__(self, **kwargs):
+        self.model = kwargs.get("model")
+
+    def _respond(self, messages) -> FakeResponse:
+        if self.injector.should_fail():
+            raise RuntimeError("Injected LLM failure")
+        prompt = messages[-1].content
+        topics = [line[len("TOPIC: "):] for line in prompt.splitlines() if line.startswith("TOPIC: ")]
+
+        def script(topic: str) -> str:
+            return " ".join(
+                f"According to official reports, development number {index} on {topic} is drawing attention."
+                for index in range(self.sentences_per_topic)
+            )
+
+        if "JSON object" in messages[0].content and topics:
+            content = json.dumps({topic: script(topic) for topic in topics})
+        else:
+            content = "\n\n".join(script(topic) for topic in (topics or ["the news"]))
+        return FakeResponse(content, input_tokens=len(prompt) // 4, output_tokens=len(content) // 4)
+
+    def invoke(self, messages):
+        time.sleep(self.injector.next_delay())
+        response = self._respond(messages)
+        time.sleep(self.seconds_per_token * len(response.content.split(" ")))
+        return response
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.injector.next_delay())
+        response = self._respond(messages)
+        await asyncio.sleep(self.seconds_per_token * len(response.content.split(" ")))
+        return response
+
+    def stream(self, messages):
+        time.sleep(self.injector.next_delay())
+        response = self._respond(messages)
+        for word in response.content.split(" "):
+            time.sleep(self.seconds_per_token)
+            yield FakeResponse(word + " ", 0, 1)
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.injector.next_delay())
+        response = self._respond(messages)
+        for word in response.content.split(" "):
+            await asyncio.sleep(self.seconds_per_token)
+            yield FakeResponse(word + " ", 0, 1)
+
+
+def fake_mp3(characters: int) -> bytes:
+    """Valid MP3 frames roughly as long as speaking this many characters (~15 chars/second)"""
+    frames = max(1, int(characters / 15 / 0.026))
+    frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+    return frame * frames
+
+
+class FakeTTS:
+    """Fake synthesizer emitting valid MP3 frames, with latency proportional to text length"""
+
+    def __init__(self, injector: FailureInjector = None, seconds_per_1k_chars: float = 0.0):
+        self.injector = injector or FailureInjector()
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+
+    def __call__(self, text: str, *args) -> bytes:
+        time.sleep(self.injector.next_delay() + self.seconds_per_1k_chars * len(text) / 1000)
+        if self.injector.should_fail():
+            raise RuntimeError("Injected TTS failure")
+        return fake_mp3(len(text))
+
+    def stream(self, text: str, *args):
+        yield self(text)
+
+
+def install_fakes(html_base_url: str, chat_injector: FailureInjector, tts: FakeTTS,
+                  gtts: FakeTTS = None, reddit_base_url: str = None) -> None:
+    """Point the real pipeline modules at the local fakes"""
+    if reddit_base_url is not None:
+        os.environ["REDDIT_BASE_URL"] = reddit_base_url
+
+    import utils
+    import pipeline
+    import tts as tts_module
+
+    def local_news_url(keyword: str) -> str:
+        return f"{html_base_url}/search?q={quote_plus(keyword)}&tbm=nws"
+
+    utils.generate_valid_news_url = local_news_url
+    pipeline.generate_valid_news_url = local_news_url
+    utils.get_brightdata_proxy_url = lambda: html_base_url
+
+    FakeChatModel.injector = chat_injector
+    utils.chat_model_class = lambda: FakeChatModel
+    utils._llm_clients.clear()
+
+    tts_module.synthesize_elevenlabs = tts
+    tts_module.synthesize_gtts = gtts or FakeTTS()
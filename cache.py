@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+
+def make_key(*parts) -> str:
+    """Build a content-addressed cache key from the inputs of a pipeline stage"""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """On-disk cache with a TTL and size-bounded LRU eviction.
+
+    Values are stored as blob files and indexed in SQLite, grouped by namespace
+    (one per pipeline stage) so hit/miss counters can be reported per stage.
+    """
+
+    def __init__(self, directory: str = "cache", max_bytes: int = 500 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False, timeout=10)
+        # WAL so worker processes sharing the cache directory don't block each other's lookups
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+
+    def _blob_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, "blobs", namespace, key[:2], key)
+
+    def _count(self, namespace: str, field: str, amount: int = 1) -> None:
+        counters = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "bytes_served": 0})
+        counters[field] += amount
+
+    def _delete(self, namespace: str, key: str) -> None:
+        self._db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        try:
+            os.remove(self._blob_path(namespace, key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return the cached value, or None on a miss or expired entry"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+
+            now = time.time()
+            if row is None or now - row[0] > self.ttl_seconds:
+                if row is not None:
+                    self._delete(namespace, key)
+                    self._db.commit()
+                self._count(namespace, "misses")
+                return None
+
+            try:
+                with open(self._blob_path(namespace, key), "rb") as f:
+                    value = f.read()
+            except FileNotFoundError:
+                self._delete(namespace, key)
+                self._db.commit()
+                self._count(namespace, "misses")
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+            )
+            self._db.commit()
+            self._count(namespace, "hits")
+            self._count(namespace, "bytes_served", len(value))
+            return value
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        """Store a value and evict least recently used entries beyond the size bound"""
+        if len(value) > self.max_bytes:
+            return
+
+        path = self._blob_path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, len(value), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Drop an entry so the next lookup misses and recomputes it"""
+        with self._lock:
+            self._delete(namespace, key)
+            self._db.commit()
+
+    def get_text(self, namespace: str, key: str) -> Optional[str]:
+        value = self.get(namespace, key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set_text(self, namespace: str, key: str, value: str) -> None:
+        self.set(namespace, key, value.encode("utf-8"))
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for namespace, key, size in self._db.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY accessed ASC"
+        ).fetchall():
+            self._delete(namespace, key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per stage plus the current size of the cache"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            return {
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "stages": {namespace: dict(counters) for namespace, counters in self._stats.items()}
+            }
+
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[DiskCache]:
+    """Return the process-wide cache, or None when caching is disabled"""
+    global _cache
+    if os.getenv("CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(
+                directory=os.getenv("CACHE_DIR", "cache"),
+                max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(500 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+            )
+        return _cache
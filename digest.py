@@ -0,0 +1,164 @@
+"""Batch digests: many users' broadcasts built from one pass over their unique topics.
+
+    python digest.py requests.jsonl [--out results.json] [--concurrency 4]
+
+Each input line is a NewsRequest JSON object (topics, source_type). Every
+unique (topic, source type) is scraped, scripted and synthesised once, and
+each broadcast is assembled by concatenating the shared topic segments, so
+the cost scales with unique topics rather than users x topics.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+from typing import Dict, List, Optional, Tuple
+
+from models import NewsRequest
+from news_scraper import NewsScraper
+from metrics import start_trace
+from utils import normalize_topic, concatenate_audio_files, close_http_clients
+from pipeline import AUDIO_DIR, build_topic_script, synthesize_script, build_response
+from settings import get_settings
+
+SegmentKey = Tuple[str, str]
+
+
+def unique_segments(requests: List[NewsRequest]) -> Dict[SegmentKey, str]:
+    """Map each unique (normalised topic, source type) to the first spelling requested"""
+    segments: Dict[SegmentKey, str] = {}
+    for request in requests:
+        for topic in request.topics:
+            segments.setdefault((normalize_topic(topic), request.source_type), topic)
+    return segments
+
+
+async def build_segment(topic: str, source_type: str, news_scraper: NewsScraper) -> Dict:
+    """Script and audio for one topic segment; errors are recorded rather than raised"""
+    try:
+        with start_trace(f"digest {topic}", route="digest"):
+            script = await build_topic_script(topic, source_type, news_scraper)
+            audio_path = await asyncio.to_thread(synthesize_script, script)
+        return {"topic": topic, "summary": script, "audio_path": audio_path}
+    except Exception as e:
+        print(f"Digest segment failed for {topic}: {str(e)}")
+        return {"topic": topic, "summary": None, "audio_path": None, "error": str(e)}
+
+
+async def assemble_broadcast(topics: List[str], segments: List[Dict]) -> Dict:
+    """Join a broadcast's segments, reporting the topics whose script or audio could not be built"""
+    parts = [segment for segment in segments if segment["summary"]]
+    missing_topics = [topic for topic, segment in zip(topics, segments) if not segment["summary"]]
+    if not parts:
+        return {
+            "status": "failed",
+            "summary": None,
+            "audio_path": None,
+            "missing_topics": missing_topics,
+            "message": "No segment could be generated for any topic in this broadcast."
+        }
+
+    summary = "\n\n".join(part["summary"] for part in parts)
+    audio_path = await asyncio.to_thread(
+        concatenate_audio_files, [part["audio_path"] for part in parts], AUDIO_DIR,
+        lambda index: synthesize_script(parts[index]["summary"])
+    )
+    response = build_response(summary, audio_path)
+    silent_topics = [topic for topic, segment in zip(topics, segments)
+                     if segment["summary"] and not (segment["audio_path"] or "").endswith(".mp3")]
+    problems = []
+    if missing_topics:
+        problems.append(f"no segment could be generated for {', '.join(missing_topics)}")
+    if silent_topics:
+        problems.append(f"no audio could be generated for {', '.join(silent_topics)}")
+    if problems:
+        response.update(
+            status="partial_success",
+            missing_topics=missing_topics,
+            missing_audio_topics=silent_topics,
+            message=f"Broadcast is incomplete: {'; '.join(problems)}."
+        )
+    return response
+
+
+async def run_digest(requests: List[NewsRequest], concurrency: Optional[int] = None) -> Dict:
+    """Generate every request's broadcast, computing each unique topic segment once"""
+    concurrency = concurrency or int(os.getenv("DIGEST_CONCURRENCY", "4"))
+    started = time.perf_counter()
+    segments = unique_segments(requests)
+    print(f"Digest: {len(requests)} broadcasts, "
+          f"{sum(len(request.topics) for request in requests)} topic slots, {len(segments)} unique segments")
+
+    limiter = asyncio.Semaphore(concurrency)
+    news_scraper = NewsScraper(max_concurrency=concurrency)
+
+    async def limited(key: SegmentKey, topic: str) -> Tuple[SegmentKey, Dict]:
+        async with limiter:
+            return key, await build_segment(topic, key[1], news_scraper)
+
+    built = dict(await asyncio.gather(*(limited(key, topic) for key, topic in segments.items())))
+
+    # Identical topic lists share one assembled file as well
+    assembled: Dict[Tuple[SegmentKey, ...], Dict] = {}
+    results = []
+    for request in requests:
+        keys = tuple((normalize_topic(topic), request.source_type) for topic in request.topics)
+        if keys not in assembled:
+            assembled[keys] = await assemble_broadcast(request.topics, [built[key] for key in keys])
+        results.append(assembled[keys])
+
+    stats = {
+        "broadcasts": len(requests),
+        "topic_slots": sum(len(request.topics) for request in requests),
+        "unique_segments": len(segments),
+        "failed_segments": sum(1 for segment in built.values() if segment.get("error")),
+        "assembled_broadcasts": len(assembled),
+        "partial_broadcasts": sum(1 for result in results if result["status"] == "partial_success"),
+        "failed_broadcasts": sum(1 for result in results if result["status"] == "failed"),
+        "elapsed_s": round(time.perf_counter() - started, 3)
+    }
+    print(f"Digest finished: {stats}")
+    return {"stats": stats, "results": results}
+
+
+def read_requests(path: str) -> List[NewsRequest]:
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with source:
+        return [NewsRequest.model_validate_json(line) for line in source if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many broadcasts from shared topic segments")
+    parser.add_argument("requests", help="JSON Lines file of NewsRequest objects, or - for stdin")
+    parser.add_argument("--out", help="Write the results to this file instead of stdout")
+    parser.add_argument("--concurrency", type=int, help="Topic segments built at once (DIGEST_CONCURRENCY)")
+    args = parser.parse_args()
+    get_settings()
+
+    async def run() -> Dict:
+        try:
+            return await run_digest(read_requests(args.requests), args.concurrency)
+        finally:
+            await close_http_clients()
+
+    # Progress logs go to stderr so stdout carries only the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        digest = asyncio.run(run())
+    all_failed = bool(digest["results"]) and digest["stats"]["failed_broadcasts"] == len(digest["results"])
+
+    output = json.dumps(digest, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(output)
+    if all_failed:
+        print("Digest failed: no broadcast could be generated", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
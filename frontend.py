@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+from urllib.parse import urlencode
 
 BACKEND_URL = "http://localhost:1234"
 
@@ -17,6 +18,16 @@ def main():
             options=["both", "news", "reddit"],
             format_func=lambda x: "📰 News" if x == "news" else ("👾 Reddit" if x == "reddit" else "🔄 Both")
         )
+        pipelined = st.checkbox(
+            "⚡ Pipelined generation",
+            value=False,
+            help="Process each topic through scraping, scripting and audio independently for faster results"
+        )
+        stream_audio = st.checkbox(
+            "🎧 Stream audio",
+            value=False,
+            help="Start playback as soon as the first topic is ready instead of waiting for the full broadcast"
+        )
     
     st.markdown("#### 📌 Topic Management") 
     col1, col2 = st.columns([4, 1])
@@ -48,6 +59,8 @@ def main():
     if st.button("🚀 Generate Summary", disabled=(len(st.session_state.topics) == 0)):
         if not st.session_state.topics:
             st.error("⚠️ Please add at least one topic")
+        elif stream_audio:
+            stream_broadcast(st.session_state.topics, source_type)
         else:
             with st.spinner("🔎 Analyzing topics and generating audio..."):
                 try:
@@ -56,6 +69,7 @@ def main():
                         json={
                             "topics": st.session_state.topics,
                             "source_type": source_type,
+                            "pipelined": pipelined,
                         },
                     )
 
@@ -93,6 +107,14 @@ def main():
                 except Exception as e:
                     st.error(f"⚠️ Unexpected Error: {str(e)}")
 
+def stream_broadcast(topics, source_type):
+    """Play the broadcast directly from the backend's chunked audio stream"""
+    query = urlencode({"topics": topics, "source_type": source_type}, doseq=True)
+    st.subheader("🎵 Audio Summary")
+    st.info("🎧 Audio will start playing as soon as the first topic is ready.")
+    # The browser's audio player consumes the chunked response as it arrives
+    st.audio(f"{BACKEND_URL}/generate-news-audio/stream?{query}", format="audio/mpeg")
+
 def handle_api_error(response):
     """Handle API error responses"""
     try:
@@ -0,0 +1,256 @@
+import os
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional
+
+from metrics import span
+
+# Tags whose strings BeautifulSoup's get_text() leaves out (script, style, template, ruby annotations)
+STRING_CONTAINER_TAGS = {"script", "style", "template", "rt", "rp"}
+
+# Tags html.parser never leaves open (mirrors bs4's HTMLTreeBuilder.empty_element_tags)
+EMPTY_ELEMENT_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer"
+}
+
+HTML_ENTITY_TO_CHARACTER = {name.rstrip(";"): character for name, character in html5.items()}
+
+MORE_MARKER = "More"
+
+
+class HeadlineCollector:
+    """Turns a stream of text lines into headlines: the first line of each block ended by "More"."""
+
+    def __init__(self):
+        self.headlines: List[str] = []
+        self._block_first: Optional[str] = None
+
+    def add_text(self, text: str) -> None:
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if line == MORE_MARKER:
+                if self._block_first is not None:
+                    self.headlines.append(self._block_first)
+                    self._block_first = None
+            elif self._block_first is None:
+                self._block_first = line
+
+    def close(self) -> str:
+        if self._block_first is not None:
+            self.headlines.append(self._block_first)
+            self._block_first = None
+        return "\n".join(self.headlines)
+
+
+class HeadlineExtractor(HTMLParser):
+    """Incremental html.parser extractor for Google News headlines.
+
+    Produces the same output as extract_headlines(clean_html_to_text(html)) in a
+    single pass, without building a tree or an intermediate text copy: text
+    nodes are split into the same boundaries BeautifulSoup's html.parser
+    builder uses and fed straight into a HeadlineCollector.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self._collector = HeadlineCollector()
+        self._data: List[str] = []
+        self._open_tags: List[str] = []
+        self._open_containers = 0
+        self._already_closed_empty: List[str] = []
+
+    def _end_data(self, include: bool = True) -> None:
+        if self._data:
+            text = "".join(self._data)
+            self._data = []
+            if include:
+                self._collector.add_text(text)
+
+    def _push(self, tag: str) -> None:
+        self._open_tags.append(tag)
+        if tag in STRING_CONTAINER_TAGS:
+            self._open_containers += 1
+
+    def _pop_to(self, tag: str) -> None:
+        if tag not in self._open_tags:
+            return
+        while self._open_tags:
+            popped = self._open_tags.pop()
+            if popped in STRING_CONTAINER_TAGS:
+                self._open_containers -= 1
+            if popped == tag:
+                break
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._end_data(include=not self._open_containers)
+        self._push(tag)
+        if tag in EMPTY_ELEMENT_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed_empty.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self._already_closed_empty:
+            self._already_closed_empty.remove(tag)
+            return
+        self._end_data(include=not self._open_containers)
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        if name[:1] in ("x", "X"):
+            codepoint = int(name[1:], 16)
+        else:
+            codepoint = int(name)
+
+        data = None
+        if codepoint < 256:
+            # Numeric references below 256 are often really Windows-1252 (e.g. &#147;)
+            try:
+                data = bytes([codepoint]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        character = HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def _handle_special(self, data: str, include: bool) -> None:
+        # Comments, doctypes, CDATA etc. are separate nodes, so they end the current string
+        self._end_data(include=not self._open_containers)
+        self._data.append(data)
+        self._end_data(include=include)
+
+    def handle_comment(self, data):
+        self._handle_special(data, include=False)
+
+    def handle_decl(self, data):
+        self._handle_special(data, include=False)
+
+    def handle_pi(self, data):
+        self._handle_special(data, include=False)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._handle_special(data[len("CDATA["):], include=True)
+        else:
+            self._handle_special(data, include=False)
+
+    def close(self) -> str:
+        """Finish parsing and return the extracted headlines, one per line"""
+        super().close()
+        self._end_data(include=not self._open_containers)
+        return self._collector.close()
+
+
+class _LxmlTextTarget:
+    """lxml parser target that forwards text outside script/style/template to a collector"""
+
+    def __init__(self, collector: HeadlineCollector):
+        self._collector = collector
+        self._data: List[str] = []
+        self._open_containers = 0
+
+    def end_data(self) -> None:
+        if self._data:
+            text = "".join(self._data)
+            self._data = []
+            if not self._open_containers:
+                self._collector.add_text(text)
+
+    def start(self, tag, attrib):
+        self.end_data()
+        if tag in STRING_CONTAINER_TAGS:
+            self._open_containers += 1
+
+    def end(self, tag):
+        self.end_data()
+        if tag in STRING_CONTAINER_TAGS and self._open_containers:
+            self._open_containers -= 1
+
+    def data(self, data):
+        self._data.append(data)
+
+    def comment(self, text):
+        self.end_data()
+
+    def pi(self, target, data=None):
+        self.end_data()
+
+
+class LxmlHeadlineExtractor:
+    """Headline extractor driven by lxml's incremental HTML parser.
+
+    Much faster than html.parser on large pages, but libxml2 repairs broken
+    markup differently, so output can differ slightly from the reference
+    BeautifulSoup path.
+    """
+
+    def __init__(self):
+        from lxml import etree
+
+        self._collector = HeadlineCollector()
+        self._target = _LxmlTextTarget(self._collector)
+        self._parser = etree.HTMLParser(target=self._target, recover=True)
+
+    def feed(self, chunk) -> None:
+        self._parser.feed(chunk)
+
+    def close(self) -> str:
+        """Finish parsing and return the extracted headlines, one per line"""
+        try:
+            self._parser.close()
+        except Exception:
+            # libxml2 raises on documents it could not recover any content from
+            pass
+        self._target.end_data()
+        return self._collector.close()
+
+
+def lxml_available() -> bool:
+    try:
+        import lxml.etree  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_headline_extractor(backend: Optional[str] = None):
+    """Create a headline extractor; backend is "html.parser" (default) or "lxml" when installed"""
+    backend = backend or os.getenv("HEADLINE_PARSER", "html.parser")
+    if backend == "lxml":
+        if lxml_available():
+            return LxmlHeadlineExtractor()
+        print("lxml is not installed, falling back to html.parser headline extraction")
+    return HeadlineExtractor()
+
+
+def extract_headlines_from_html(html: str, backend: Optional[str] = None, chunk_size: int = 64 * 1024) -> str:
+    """Extract headlines straight from page markup in one streaming pass"""
+    return extract_headlines_from_chunks(
+        (html[i:i + chunk_size] for i in range(0, len(html), chunk_size)), backend
+    )
+
+
+def extract_headlines_from_chunks(chunks: Iterable[str], backend: Optional[str] = None) -> str:
+    """Extract headlines from markup arriving in chunks, e.g. straight off the network"""
+    extractor = create_headline_extractor(backend)
+    with span("extract_headlines", parser=type(extractor).__name__):
+        for chunk in chunks:
+            extractor.feed(chunk)
+        return extractor.close()
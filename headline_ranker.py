@@ -0,0 +1,104 @@
+import os
+import zlib
+from typing import Dict, List, Optional
+
+from metrics import span
+from headline_store import normalize_headline
+
+N_FEATURES = 1 << 12
+STOPWORDS = frozenset("a an and are as at be by for from has in is it its of on or that the to was with".split())
+
+
+def _terms(text: str) -> List[str]:
+    """Unigrams and bigrams of a normalised headline, ignoring stopwords"""
+    words = [word for word in normalize_headline(text).split() if word not in STOPWORDS]
+    return words + [f"{left} {right}" for left, right in zip(words, words[1:])]
+
+
+def tfidf_vectors(texts: List[str], n_features: int = N_FEATURES) -> "np.ndarray":
+    """L2-normalised TF-IDF rows over hashed unigram/bigram features"""
+    import numpy as np
+
+    counts = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for term in _terms(text):
+            counts[row, zlib.crc32(term.encode("utf-8")) % n_features] += 1
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    vectors = np.log1p(counts) * idf.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def ranking_enabled() -> bool:
+    return os.getenv("HEADLINE_RANKING_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def rank_headlines(headlines_by_topic: Dict[str, str], top_n: Optional[int] = None,
+                   token_budget: Optional[int] = None, threshold: Optional[float] = None) -> Dict[str, str]:
+    """Collapse near-duplicate headlines across topics and keep each topic's most relevant ones.
+
+    Headlines are scored by similarity to their topic's name, by centrality
+    (stories many outlets cover score higher) and by their position on the
+    results page. Going from the highest score down, a headline is dropped
+    if it is within `threshold` cosine similarity of one already kept, in
+    any topic, so a story shared by overlapping topics is told only once,
+    under the topic it fits best. Each topic then keeps at most top_n
+    headlines and token_budget estimated tokens, most relevant first.
+    """
+    import numpy as np
+
+    top_n = top_n or int(os.getenv("HEADLINE_TOP_N", "15"))
+    token_budget = token_budget or int(os.getenv("HEADLINE_TOKEN_BUDGET", "400"))
+    threshold = threshold or float(os.getenv("HEADLINE_SIMILARITY_THRESHOLD", "0.8"))
+
+    entries = []
+    for topic, headlines in headlines_by_topic.items():
+        lines = [line.strip() for line in headlines.split("\n") if line.strip()]
+        entries.extend((topic, position, len(lines), line) for position, line in enumerate(lines))
+    if not entries:
+        return dict(headlines_by_topic)
+
+    with span("rank_headlines", headlines=len(entries), topics=len(headlines_by_topic)):
+        topics = list(headlines_by_topic)
+        vectors = tfidf_vectors([line for _, _, _, line in entries] + topics)
+        headline_vectors, topic_vectors = vectors[:len(entries)], vectors[len(entries):]
+        topic_index = np.array([topics.index(topic) for topic, _, _, _ in entries])
+        similarities = headline_vectors @ headline_vectors.T
+
+        # Mean similarity to the other headlines of the same topic
+        same_topic = topic_index[:, None] == topic_index[None, :]
+        np.fill_diagonal(same_topic, False)
+        peers = np.maximum(same_topic.sum(axis=1), 1)
+        centrality = (similarities * same_topic).sum(axis=1) / peers
+
+        relevance = np.einsum("ij,ij->i", headline_vectors, topic_vectors[topic_index])
+        position = np.array([1 - position / count for _, position, count, _ in entries], dtype=np.float32)
+        scores = relevance + centrality + 0.5 * position
+
+        kept_rows = []
+        selected: Dict[str, List[str]] = {topic: [] for topic in topics}
+        budgets = {topic: token_budget for topic in topics}
+        for row in np.argsort(-scores, kind="stable"):
+            topic, _, _, line = entries[row]
+            if kept_rows and similarities[row, kept_rows].max() >= threshold:
+                continue
+            tokens = estimate_tokens(line)
+            if len(selected[topic]) < top_n and tokens <= budgets[topic]:
+                # Only headlines actually told suppress their near-duplicates in other topics
+                kept_rows.append(row)
+                selected[topic].append(line)
+                budgets[topic] -= tokens
+
+    kept = sum(len(lines) for lines in selected.values())
+    print(f"Headline ranking kept {kept} of {len(entries)} headlines across {len(topics)} topics")
+    # A topic whose every headline was told under another topic still keeps its best one
+    return {
+        topic: "\n".join(selected[topic]) or headlines_by_topic[topic].strip().split("\n")[0]
+        for topic in topics
+    }
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import time
+import hashlib
+import operator
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from cache import get_cache, make_key
+from metrics import span
+from utils import normalize_topic
+
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 5
+
+# Covered headlines per topic, used when the disk cache is disabled
+_memory_store: Dict[str, Dict] = {}
+_memory_lock = threading.Lock()
+
+
+def normalize_headline(headline: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial edits don't look new"""
+    return " ".join(re.sub(r"[^\w\s]", " ", headline.lower()).split())
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def minhash(normalized: str) -> List[int]:
+    """MinHash signature over character shingles of a normalised headline.
+
+    Each shingle's NUM_PERMUTATIONS hash values come from one SHAKE-128
+    digest, which is much cheaper in pure Python than applying a separate
+    permutation per hash.
+    """
+    padded = normalized if len(normalized) >= SHINGLE_SIZE else normalized.ljust(SHINGLE_SIZE)
+    rows = [
+        array("I", hashlib.shake_128(shingle.encode("utf-8")).digest(4 * NUM_PERMUTATIONS))
+        for shingle in {padded[index:index + SHINGLE_SIZE] for index in range(len(padded) - SHINGLE_SIZE + 1)}
+    ]
+    return list(map(min, zip(*rows)))
+
+
+def similarity(signature: List[int], other: List[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(map(operator.eq, signature, other)) / len(signature)
+
+
+class HeadlineDiff:
+    """Which of a topic's headlines are new since its cached script was written"""
+
+    def __init__(self, topic: str, headlines: List[str], new_headlines: List[str], previous: Optional[Dict],
+                 signatures: Dict[str, List[int]]):
+        self.topic = topic
+        self.headlines = headlines
+        self.new_headlines = new_headlines
+        self.previous = previous
+        self.signatures = signatures
+
+    @property
+    def unchanged(self) -> bool:
+        """True when the cached script already covers every headline"""
+        return self.previous is not None and not self.new_headlines
+
+    @property
+    def incremental(self) -> bool:
+        """True when only the new headlines need summarising before merging into the cached script"""
+        refresh_ratio = float(os.getenv("HEADLINE_REFRESH_RATIO", "0.6"))
+        return (self.previous is not None and bool(self.new_headlines)
+                and len(self.new_headlines) <= refresh_ratio * len(self.headlines))
+
+    def prompt_headlines(self) -> str:
+        """Headlines to send to the LLM: just the new ones when merging, otherwise all of them"""
+        return "\n".join(self.new_headlines if self.incremental else self.headlines)
+
+    def merge(self, summary: str) -> str:
+        """Combine the LLM output with the cached script, newest stories first"""
+        if self.unchanged:
+            return self.previous["script"]
+        if not self.incremental:
+            return summary
+        if not summary.strip() or summary.startswith("Error"):
+            # Keep serving the previous script rather than prepending an error to it
+            return self.previous["script"]
+
+        max_chars = int(os.getenv("HEADLINE_SCRIPT_MAX_CHARS", "4000"))
+        paragraphs = [summary.strip()]
+        length = len(paragraphs[0])
+        for paragraph in self.previous["script"].split("\n\n"):
+            if paragraph.strip() and length + len(paragraph) <= max_chars:
+                paragraphs.append(paragraph.strip())
+                length += len(paragraph)
+        return "\n\n".join(paragraphs)
+
+
+class HeadlineStore:
+    """Per-topic record of the headlines behind each topic's cached news script"""
+
+    def __init__(self, threshold: Optional[float] = None, max_covered: int = 100):
+        self.threshold = threshold or float(os.getenv("HEADLINE_DUP_THRESHOLD", "0.7"))
+        self.max_covered = max_covered
+
+    def _load(self, topic: str) -> Optional[Dict]:
+        cache = get_cache()
+        if cache:
+            stored = cache.get_text("headlines", make_key(topic))
+            return json.loads(stored) if stored else None
+        with _memory_lock:
+            return _memory_store.get(topic)
+
+    def _save(self, topic: str, record: Dict) -> None:
+        cache = get_cache()
+        if cache:
+            cache.set_text("headlines", make_key(topic), json.dumps(record))
+        else:
+            with _memory_lock:
+                _memory_store[topic] = record
+
+    def diff(self, topic: str, headlines: str) -> HeadlineDiff:
+        """Split a topic's headlines into ones the cached script covers and near-duplicate-free new ones"""
+        with span("headline_diff"):
+            lines = list(dict.fromkeys(line.strip() for line in headlines.split("\n") if line.strip()))
+            previous = self._load(normalize_topic(topic))
+            covered = previous["covered"] if previous else []
+            covered_fingerprints = {entry["fp"] for entry in covered}
+
+            new_headlines, signatures = [], {}
+            for line in lines:
+                normalized = normalize_headline(line)
+                line_fingerprint = fingerprint(normalized)
+                if line_fingerprint in covered_fingerprints:
+                    continue
+                signature = signatures[line] = minhash(normalized)
+                if not any(similarity(signature, entry["sig"]) >= self.threshold for entry in covered):
+                    new_headlines.append(line)
+
+        if previous:
+            print(f"Headline diff for {topic}: {len(new_headlines)} new of {len(lines)}")
+        return HeadlineDiff(topic, lines, new_headlines, previous, signatures)
+
+    def save(self, headline_diff: HeadlineDiff, script: str) -> None:
+        """Record the script for a topic along with the headlines it now covers"""
+        if not script or script.startswith("Error"):
+            return
+        previous_covered = headline_diff.previous["covered"] if headline_diff.previous else []
+        if not headline_diff.incremental and not headline_diff.unchanged:
+            # A full re-summary only covers the current headlines
+            previous_covered = []
+
+        entries, seen = [], set()
+        for line in headline_diff.headlines:
+            normalized = normalize_headline(line)
+            line_fingerprint = fingerprint(normalized)
+            if line_fingerprint not in seen:
+                seen.add(line_fingerprint)
+                entries.append({"fp": line_fingerprint,
+                                "sig": headline_diff.signatures.get(line) or minhash(normalized)})
+        entries.extend(entry for entry in previous_covered if entry["fp"] not in seen)
+
+        self._save(normalize_topic(headline_diff.topic), {
+            "script": script,
+            "covered": entries[:self.max_covered],
+            "updated": time.time()
+        })
+
+
+_store: Optional[HeadlineStore] = None
+
+
+def get_headline_store() -> Optional[HeadlineStore]:
+    """Return the process-wide headline store, or None when incremental diffing is disabled"""
+    global _store
+    if os.getenv("HEADLINE_DIFF_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    if _store is None:
+        _store = HeadlineStore()
+    return _store
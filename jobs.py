@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from models import NewsRequest, DigestRequest
+from metrics import start_trace
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Job kinds and the request model each one stores
+REQUEST_MODELS = {"broadcast": NewsRequest, "digest": DigestRequest}
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its configured depth"""
+
+
+class JobNotFoundError(Exception):
+    """Raised when waiting on a job that is not in the store (unknown id or pruned)"""
+
+
+class JobStore:
+    """SQLite-backed persistence for broadcast jobs so queued work survives restarts"""
+
+    def __init__(self, path: str = "jobs.db", lease_seconds: float = 60):
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets several worker processes share the queue without blocking each other's reads
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, "
+            "result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL, owner TEXT, "
+            "kind TEXT NOT NULL DEFAULT 'broadcast', lease_expires REAL)"
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "kind" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'broadcast'")
+        if "lease_expires" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease_expires REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def create(self, request: Union[NewsRequest, DigestRequest], max_queued: Optional[int] = None) -> str:
+        """Insert a queued job, refusing it if the queue already holds max_queued jobs"""
+        job_id = uuid.uuid4().hex
+        kind = "digest" if isinstance(request, DigestRequest) else "broadcast"
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if max_queued is not None:
+                    queued = self._db.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+                    ).fetchone()[0]
+                    if queued >= max_queued:
+                        raise QueueFullError(f"Job queue is full ({queued} queued)")
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, request, created, kind) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, request.model_dump_json(), time.time(), kind)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim_next(self) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running, leased to this worker, and return it"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, request, kind FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, started = ?, owner = ?, lease_expires = ? WHERE id = ?",
+                        (RUNNING, now, self.owner, now + self.lease_seconds, row["id"])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row["id"], "request": REQUEST_MODELS[row["kind"]].model_validate_json(row["request"])}
+
+    def renew_lease(self, job_id: str) -> bool:
+        """Extend this worker's lease on a running job; False if the job was requeued in the meantime"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND owner = ?",
+                (time.time() + self.lease_seconds, job_id, RUNNING, self.owner)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_expires = NULL WHERE id = ?",
+                (FAILED if error else DONE, json.dumps(result) if result is not None else None,
+                 error, time.time(), job_id)
+            )
+
+    def requeue_expired(self) -> int:
+        """Put running jobs whose lease has lapsed back on the queue.
+
+        A lease is renewed while its worker is alive, so this catches workers
+        that crashed or were redeployed on any host, without disturbing jobs a
+        live sibling process is still running.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, started = NULL, owner = NULL, lease_expires = NULL "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+                (QUEUED, RUNNING, time.time())
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Delete finished and failed jobs that completed more than max_age_seconds ago"""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, cutoff)
+            )
+            return cursor.rowcount
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+
+class JobQueue:
+    """Bounded worker pool that executes persisted broadcast jobs"""
+
+    def __init__(self, store: JobStore, runner: Callable[[Union[NewsRequest, DigestRequest]], Awaitable[Dict]],
+                 workers: int = 2, max_queue_depth: int = 20, poll_interval: float = 1.0,
+                 retention_seconds: Optional[float] = 24 * 3600, prune_interval: float = 3600):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.prune_interval = prune_interval
+        self._wakeup = asyncio.Event()
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+        print(f"Started {self.workers} job workers (queue depth {self.max_queue_depth})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: Union[NewsRequest, DigestRequest]) -> str:
+        """Persist a job and wake a worker; raises QueueFullError when the queue is at capacity"""
+        job_id = await asyncio.to_thread(self.store.create, request, self.max_queue_depth)
+        self._wakeup.set()
+        return job_id
+
+    async def wait(self, job_id: str) -> Dict:
+        """Wait for a job to finish and return its stored record.
+
+        Raises JobNotFoundError if the id is unknown or the job was pruned.
+        """
+        finished = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job is None:
+                    raise JobNotFoundError(f"Job {job_id} not found")
+                if job["status"] in (DONE, FAILED):
+                    return job
+                try:
+                    await asyncio.wait_for(finished.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._finished.pop(job_id, None)
+
+    async def _housekeeping(self) -> None:
+        """Requeue jobs whose worker stopped renewing its lease and delete finished jobs past retention"""
+        last_pruned = None
+        while True:
+            try:
+                requeued = await asyncio.to_thread(self.store.requeue_expired)
+                if requeued:
+                    print(f"Requeued {requeued} interrupted jobs")
+                if self.retention_seconds and (last_pruned is None
+                                               or time.monotonic() - last_pruned >= self.prune_interval):
+                    last_pruned = time.monotonic()
+                    pruned = await asyncio.to_thread(self.store.prune, self.retention_seconds)
+                    if pruned:
+                        print(f"Pruned {pruned} finished jobs")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job housekeeping failed: {str(e)}")
+            await asyncio.sleep(min(self.store.lease_seconds / 2, self.prune_interval))
+
+    async def _renew_lease(self, job_id: str) -> None:
+        """Keep a running job leased to this worker so other workers don't requeue it"""
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self.store.renew_lease, job_id):
+                    print(f"Lost the lease on job {job_id}; another worker may rerun it")
+                    return
+            except Exception as e:
+                print(f"Renewing the lease on job {job_id} failed: {str(e)}")
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            print(f"Worker {index} running job {job['id']}")
+            lease = asyncio.create_task(self._renew_lease(job["id"]))
+            try:
+                with start_trace(f"job {job['id']}", route="job"):
+                    result = await self.runner(job["request"])
+                await asyncio.to_thread(self.store.finish, job["id"], result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job {job['id']} failed: {str(e)}")
+                await asyncio.to_thread(self.store.finish, job["id"], None, str(e))
+            finally:
+                lease.cancel()
+                if job["id"] in self._finished:
+                    self._finished[job["id"]].set()
+
+
+def create_job_queue(runner: Callable[[Union[NewsRequest, DigestRequest]], Awaitable[Dict]]) -> JobQueue:
+    """Build the job queue from environment configuration"""
+    return JobQueue(
+        store=JobStore(os.getenv("JOBS_DB", "jobs.db"), float(os.getenv("JOB_LEASE_SECONDS", "60"))),
+        runner=runner,
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+        max_queue_depth=int(os.getenv("JOB_QUEUE_DEPTH", "20")),
+        # 0 keeps finished jobs forever
+        retention_seconds=float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600
+    )
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0") or 0)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+CHARS_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+TOKENS_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (counts, total, count) in sorted(self._series.items()):
+                labels = f'{self.label}="{label_value}"'
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "ai_journalist_stage_duration_seconds", "Duration of pipeline stages", "stage", DURATION_BUCKETS
+)
+REQUEST_DURATION = Histogram(
+    "ai_journalist_request_duration_seconds", "Duration of HTTP requests and jobs", "route", DURATION_BUCKETS
+)
+FETCHED_BYTES = Histogram(
+    "ai_journalist_fetched_bytes", "Bytes fetched per scraped page", "source", BYTES_BUCKETS
+)
+SYNTHESIZED_CHARACTERS = Histogram(
+    "ai_journalist_synthesized_characters", "Characters sent to TTS per call", "provider", CHARS_BUCKETS
+)
+LLM_TOKENS = Histogram(
+    "ai_journalist_llm_tokens", "Tokens per LLM call", "direction", TOKENS_BUCKETS
+)
+HISTOGRAMS = (STAGE_DURATION, REQUEST_DURATION, FETCHED_BYTES, SYNTHESIZED_CHARACTERS, LLM_TOKENS)
+
+
+class Trace:
+    """Spans recorded for one request or job"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_s": round(time.perf_counter() - self.started, 4),
+            "spans": self.spans
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("stage", "attributes", "started")
+
+    def __init__(self, stage: str, attributes: Dict):
+        self.stage = stage
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        STAGE_DURATION.observe(self.stage, duration)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({
+                "stage": self.stage,
+                "start_s": round(self.started - trace.started, 4),
+                "duration_s": round(duration, 4),
+                "error": exc_type.__name__ if exc_type else None,
+                **self.attributes
+            })
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str, **attributes):
+    """Time a pipeline stage; attaches to the current trace and the stage histogram"""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage, attributes)
+
+
+def observe(histogram: Histogram, label_value: str, value: float) -> None:
+    if ENABLED:
+        histogram.observe(label_value, value)
+
+
+class TraceContext:
+    """Context manager that starts a trace and logs it when it exceeds SLOW_REQUEST_SECONDS"""
+
+    def __init__(self, name: str, route: Optional[str] = None):
+        self.name = name
+        self.route = route or name
+        self._trace = None
+        self._token = None
+
+    def __enter__(self) -> Optional[Trace]:
+        if ENABLED:
+            self._trace = Trace(self.name)
+            self._token = _current_trace.set(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is None:
+            return False
+        _current_trace.reset(self._token)
+        duration = time.perf_counter() - self._trace.started
+        REQUEST_DURATION.observe(self.route, duration)
+        if SLOW_REQUEST_SECONDS and duration >= SLOW_REQUEST_SECONDS:
+            print(f"Slow request: {json.dumps(self._trace.to_dict())}")
+        return False
+
+
+def start_trace(name: str, route: Optional[str] = None) -> TraceContext:
+    """Start a trace for a request or job; route labels the request duration histogram"""
+    return TraceContext(name, route)
+
+
+def render_metrics() -> str:
+    """All histograms in Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -3,4 +3,8 @@ from typing import List
 
 class NewsRequest(BaseModel):
     topics: List[str]
-    source_type: str = "both"
\ No newline at end of file
+    source_type: str = "both"
+    pipelined: bool = False
+
+class DigestRequest(BaseModel):
+    requests: List[NewsRequest]
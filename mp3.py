@@ -0,0 +1,145 @@
+from typing import Iterator, List, Optional, Tuple
+
+# (MPEG version bits, layer bits, sample rate, mono) shared by every frame of a playable stream
+StreamFormat = Tuple[int, int, int, bool]
+
+
+class MP3FormatError(ValueError):
+    """Raised when joining segments whose frames differ in MPEG version, layer, sample rate or channels"""
+
+# Bitrates in kbps indexed by [version_is_mpeg1][layer][bitrate_index]
+_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+
+# Sample rates in Hz indexed by version bits (0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1)
+_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+def id3v2_size(data: bytes, offset: int = 0) -> int:
+    """Length of an ID3v2 tag starting at offset, or 0 if there is none"""
+    if data[offset:offset + 3] != b"ID3" or len(data) < offset + 10:
+        return 0
+    size = ((data[offset + 6] & 0x7F) << 21) | ((data[offset + 7] & 0x7F) << 14) \
+        | ((data[offset + 8] & 0x7F) << 7) | (data[offset + 9] & 0x7F)
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def frame_length(header: bytes) -> Optional[int]:
+    """Length in bytes of the MPEG audio frame with this 4-byte header, or None if it isn't one"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[is_mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 3 and not is_mpeg1:
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
+
+
+def is_info_frame(frame: bytes) -> bool:
+    """True for Xing/Info/VBRI header frames, which describe one file and carry no audio"""
+    head = frame[:64]
+    return b"Xing" in head or b"Info" in head or frame[36:40] == b"VBRI"
+
+
+def iter_frames(data: bytes) -> Iterator[Tuple[int, int]]:
+    """Yield (offset, length) of every MPEG audio frame, skipping tags and junk between frames"""
+    position = id3v2_size(data)
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+
+    while position + 4 <= end:
+        length = frame_length(data[position:position + 4])
+        if length and position + length <= end:
+            yield position, length
+            position += length
+            continue
+
+        tag_size = id3v2_size(data, position)
+        if tag_size:
+            position += tag_size
+            continue
+
+        # Resynchronise on the next frame sync marker
+        next_sync = data.find(b"\xff", position + 1, end)
+        if next_sync < 0:
+            break
+        position = next_sync
+
+
+def audio_frames(data: bytes) -> bytes:
+    """The raw audio frames of an MP3, without tags or Xing/Info header frames"""
+    frames = []
+    for index, (offset, length) in enumerate(iter_frames(data)):
+        frame = data[offset:offset + length]
+        if index == 0 and is_info_frame(frame):
+            continue
+        frames.append(frame)
+    return b"".join(frames)
+
+
+def stream_format(data: bytes) -> Optional[StreamFormat]:
+    """Format of the first audio frame in an MP3, or None if it has no frames"""
+    for offset, _ in iter_frames(data):
+        header = data[offset:offset + 4]
+        version_bits = (header[1] >> 3) & 0x03
+        return (version_bits, (header[1] >> 1) & 0x03, _SAMPLE_RATES[version_bits][(header[2] >> 2) & 0x03],
+                header[3] >> 6 == 3)
+    return None
+
+
+def describe_format(stream: StreamFormat) -> str:
+    version = {0: "MPEG2.5", 2: "MPEG2", 3: "MPEG1"}[stream[0]]
+    return f"{version} layer {4 - stream[1]} {stream[2]} Hz {'mono' if stream[3] else 'stereo'}"
+
+
+def join_mp3(segments: List[bytes]) -> bytes:
+    """Join MP3 segments frame by frame without re-encoding.
+
+    Per-segment tags and Xing/Info headers are dropped, since they would
+    describe only their own segment and confuse duration and seeking in
+    players once concatenated. Segments must share one stream format (e.g.
+    ElevenLabs' 44.1 kHz MPEG1 can't be followed by gTTS' 24 kHz MPEG2,
+    which many players mis-decode); MP3FormatError is raised otherwise.
+    """
+    expected = None
+    for index, segment in enumerate(segments):
+        found = stream_format(segment) if segment else None
+        if found is None:
+            continue
+        if expected is None:
+            expected = found
+        elif found != expected:
+            raise MP3FormatError(f"Segment {index} is {describe_format(found)}, "
+                                 f"but the first segment is {describe_format(expected)}")
+    return b"".join(audio_frames(segment) for segment in segments if segment)
@@ -1,66 +1,130 @@
 import os
 import asyncio
-from typing import Dict, List
-from dotenv import load_dotenv
-load_dotenv()
+from typing import Dict, List, Optional, Tuple
 
+from singleflight import SingleFlight
 from utils import (
+    normalize_topic,
     generate_news_urls_to_scrape,
-    scrape_with_brightdata, 
-    clean_html_to_text,
-    extract_headlines,
-    summarize_with_gemini_news_script
+    scrape_headlines_async,
+    asummarize_with_gemini_news_script,
+    summarize_topics_with_gemini
 )
+from headline_store import get_headline_store
+from headline_ranker import rank_headlines, ranking_enabled
+from settings import get_settings
 
-load_dotenv()
+# Shared across scraper instances so concurrent requests for one topic scrape it once
+_topic_flights = SingleFlight()
 
 class NewsScraper:
-    def __init__(self):
-        self._rate_limiter = asyncio.Semaphore(3)
+    def __init__(self, max_concurrency: Optional[int] = None):
+        max_concurrency = max_concurrency or int(os.getenv("NEWS_SCRAPE_CONCURRENCY", "3"))
+        self._rate_limiter = asyncio.Semaphore(max_concurrency)
 
     async def scrape_news(self, topics: List[str]) -> Dict[str, str]:
-        """Scrape and analyze news articles for given topics"""
-        results = {}
-        
+        """Scrape topics concurrently, then summarize all their headlines in one batched LLM pass"""
         urls_dict = generate_news_urls_to_scrape(topics)
-        
-        for topic in topics:
-            async with self._rate_limiter:
-                try:
-                    url = urls_dict.get(topic)
-                    if not url:
-                        results[topic] = f"No URL generated for topic: {topic}"
-                        continue
-                    
-                    print(f"Scraping news for topic: {topic}")
-                    search_html = scrape_with_brightdata(url)
-                    
-                    if not search_html or "Error" in search_html:
-                        results[topic] = f"Failed to scrape content for {topic}"
-                        continue
-                    
-                    clean_text = clean_html_to_text(search_html)
-                    headlines = extract_headlines(clean_text)
-                    
-                    if not headlines:
-                        results[topic] = f"No headlines found for {topic}"
-                        continue
-                    
-                    summary = summarize_with_gemini_news_script(
-                        api_key=os.getenv("GEMINI_API_KEY"),
-                        headlines=headlines
-                    )
-                    
-                    results[topic] = summary
-                    print(f"Successfully processed news for topic: {topic}")
-                    
-                except Exception as e:
-                    error_msg = f"Error processing {topic}: {str(e)}"
-                    print(error_msg)
-                    results[topic] = error_msg
-                
-                await asyncio.sleep(2)
-        
-        return {"news_analysis": results}
 
+        fetched = await asyncio.gather(*(
+            self.fetch_headlines(topic, urls_dict.get(topic)) for topic in topics
+        ))
+
+        results = {}
+        headlines_by_topic = {}
+        for topic, (headlines, error) in zip(topics, fetched):
+            if headlines:
+                headlines_by_topic[topic] = headlines
+            else:
+                results[topic] = error
+
+        if headlines_by_topic:
+            if ranking_enabled():
+                # Overlapping topics share stories; tell each one once and trim to the most relevant
+                headlines_by_topic = await asyncio.to_thread(rank_headlines, headlines_by_topic)
+            store = get_headline_store()
+            diffs = {
+                topic: await asyncio.to_thread(store.diff, topic, headlines)
+                for topic, headlines in headlines_by_topic.items()
+            } if store else {}
+            # Topics whose cached script covers every headline skip the LLM entirely
+            to_summarize = {
+                topic: diffs[topic].prompt_headlines() if topic in diffs else headlines
+                for topic, headlines in headlines_by_topic.items()
+                if topic not in diffs or not diffs[topic].unchanged
+            }
+            summaries = await summarize_topics_with_gemini(
+                api_key=get_settings().gemini_api_key,
+                headlines_by_topic=to_summarize
+            ) if to_summarize else {}
+
+            for topic in headlines_by_topic:
+                if topic in diffs:
+                    results[topic] = diffs[topic].merge(summaries.get(topic, ""))
+                    await asyncio.to_thread(store.save, diffs[topic], results[topic])
+                else:
+                    results[topic] = summaries[topic]
+            print(f"Successfully processed news for topics: {list(headlines_by_topic)}")
+
+        return {"news_analysis": {topic: results[topic] for topic in topics}}
+
+    async def scrape_topic(self, topic: str, url: Optional[str]) -> str:
+        """Scrape, clean and summarize a single topic, sharing work with identical in-flight topics"""
+        return await _topic_flights.do(
+            ("summary", normalize_topic(topic)),
+            lambda: self._scrape_topic(topic, url)
+        )
+
+    async def _scrape_topic(self, topic: str, url: Optional[str]) -> str:
+        headlines, error = await self.fetch_headlines(topic, url)
+        if error:
+            return error
+
+        if ranking_enabled():
+            headlines = (await asyncio.to_thread(rank_headlines, {topic: headlines}))[topic]
+
+        store = get_headline_store()
+        headline_diff = await asyncio.to_thread(store.diff, topic, headlines) if store else None
+        if headline_diff and headline_diff.unchanged:
+            print(f"Headlines unchanged for topic: {topic}, reusing cached script")
+            return headline_diff.merge("")
+
+        summary = await asummarize_with_gemini_news_script(
+            api_key=get_settings().gemini_api_key,
+            headlines=headline_diff.prompt_headlines() if headline_diff else headlines
+        )
+        if headline_diff:
+            summary = headline_diff.merge(summary)
+            await asyncio.to_thread(store.save, headline_diff, summary)
+
+        print(f"Successfully processed news for topic: {topic}")
+        return summary
+
+    async def fetch_headlines(self, topic: str, url: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Scrape a topic's results page and extract headlines, returning (headlines, error message)"""
+        return await _topic_flights.do(
+            ("headlines", normalize_topic(topic)),
+            lambda: self._fetch_headlines(topic, url)
+        )
+
+    async def _fetch_headlines(self, topic: str, url: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        async with self._rate_limiter:
+            try:
+                if not url:
+                    return None, f"No URL generated for topic: {topic}"
+
+                print(f"Scraping news for topic: {topic}")
+                headlines = await scrape_headlines_async(url)
+
+                if headlines is None:
+                    return None, f"Failed to scrape content for {topic}"
+
+                if not headlines:
+                    return None, f"No headlines found for {topic}"
+
+                return headlines, None
 
+            except Exception as e:
+                error_msg = f"Error processing {topic}: {str(e)}"
+                print(error_msg)
+                return None, error_msg
@@ -0,0 +1,73 @@
+import os
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from cache import DiskCache
+
+# Boilerplate the broadcast prompt (utils.BROADCAST_SYSTEM_PROMPT) tells Gemini to use; longest first so
+# "Meanwhile, online discussions on Reddit reveal" wins over "Meanwhile"
+BROADCAST_PHRASES = (
+    "Meanwhile, online discussions on Reddit reveal",
+    "Online discussions on Reddit reveal",
+    "Meanwhile, online discussions",
+    "According to official reports",
+    "To wrap up this segment",
+    "To wrap up",
+    "Meanwhile",
+)
+
+# A phrase is only spliced at the start of a sentence and when punctuation follows it, so the
+# boundary between the snippet and the synthesized remainder falls on a natural pause
+PHRASE_PATTERN = re.compile(
+    r"(?:^|(?<=[.!?]\s))(" + "|".join(re.escape(phrase) for phrase in BROADCAST_PHRASES) + r")(\.\.\.|…|[,:;.])",
+    re.MULTILINE
+)
+
+
+def split_stored_phrases(text: str, is_stored: Callable[[str], bool]) -> Tuple[List[Tuple[str, bool]], List[str]]:
+    """Split text into (part, is_phrase) pieces around the boilerplate phrases already in the library.
+
+    Only stored phrases become pieces of their own; the text between them,
+    including phrases not stored yet, stays whole so it is voiced in one call
+    with natural prosody. Also returns the phrases that are missing from the library.
+    """
+    parts, missing, position = [], [], 0
+    for match in PHRASE_PATTERN.finditer(text):
+        phrase = match.group(0)
+        if not is_stored(phrase):
+            missing.append(phrase)
+            continue
+        before = text[position:match.start()].strip()
+        if before:
+            parts.append((before, False))
+        parts.append((phrase, True))
+        position = match.end()
+    rest = text[position:].strip()
+    if rest:
+        parts.append((rest, False))
+    return parts, missing
+
+
+_library: Optional[DiskCache] = None
+_library_lock = threading.Lock()
+
+
+def get_phrase_library() -> Optional[DiskCache]:
+    """Return the process-wide library of pre-rendered phrase audio, or None unless PHRASE_LIBRARY_ENABLED is set.
+
+    Snippets are stored under the same voice/model/format key as TTS chunks,
+    in a cache of their own so they outlive the short-lived pipeline cache.
+    """
+    global _library
+    if os.getenv("PHRASE_LIBRARY_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _library_lock:
+        if _library is None:
+            _library = DiskCache(
+                directory=os.getenv("PHRASE_LIBRARY_DIR", "phrase_audio"),
+                max_bytes=int(os.getenv("PHRASE_LIBRARY_MAX_BYTES", str(50 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("PHRASE_LIBRARY_TTL_SECONDS", str(30 * 24 * 3600)))
+            )
+        return _library
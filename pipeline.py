@@ -0,0 +1,343 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List
+
+from models import NewsRequest
+from news_scraper import NewsScraper
+from singleflight import SingleFlight
+from reddit_scraper import scrape_reddit_topics, process_topic_simple
+from utils import (
+    normalize_topic,
+    generate_valid_news_url,
+    generate_broadcast_news,
+    astream_broadcast_news,
+    text_to_audio_elevenlabs_sdk,
+    concatenate_audio_files
+)
+from tts import stream_text_to_audio, SentenceBuffer, IncrementalSynthesizer
+from artifacts import get_artifact_store
+from settings import get_settings
+from mp3 import MP3FormatError, audio_frames, describe_format, stream_format
+
+TTS_VOICE_ID = "JBFqnCBsd6RMkJVDRzZb"
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+AUDIO_DIR = "audio"
+
+
+class StreamingAudioError(RuntimeError):
+    """Raised at the end of an audio stream that had to leave out one or more topics"""
+
+
+# Overlapping topic sets from concurrent requests share per-topic script generation
+_segment_flights = SingleFlight()
+
+
+def synthesize_script(text: str) -> str:
+    """Convert a broadcast script to audio with the default voice settings"""
+    return text_to_audio_elevenlabs_sdk(
+        text=text,
+        voice_id=TTS_VOICE_ID,
+        model_id=TTS_MODEL_ID,
+        output_format=TTS_OUTPUT_FORMAT,
+        output_dir=AUDIO_DIR
+    )
+
+
+def build_response(summary: str, audio_path: str) -> Dict:
+    """Build the API response for a generated broadcast"""
+    if audio_path:
+        print(f"Audio conversion successful: {audio_path}")
+        return {
+            "status": "success",
+            "summary": summary,
+            "audio_path": audio_path
+        }
+
+    print("Audio conversion failed, but returning summary")
+    # Return summary even if audio fails
+    return {
+        "status": "partial_success",
+        "summary": summary,
+        "audio_path": None,
+        "message": "Summary generated successfully, but audio conversion failed. You can still read the summary."
+    }
+
+
+async def run_broadcast(request: NewsRequest) -> Dict:
+    """Generate a broadcast in strict phases: scrape everything, summarize once, synthesize once"""
+    results = {}
+
+    # Scrape news
+    if request.source_type in ["news", "both"]:
+        print("Starting news scraping...")
+        news_scraper = NewsScraper()
+        results["news"] = await news_scraper.scrape_news(request.topics)
+        print(f"News scraping completed: {results['news']}")
+
+    # Scrape reddit
+    if request.source_type in ["reddit", "both"]:
+        print("Starting Reddit scraping...")
+        results["reddit"] = await scrape_reddit_topics(request.topics)
+        print(f"Reddit scraping completed: {results['reddit']}")
+
+    # Extract results
+    news_data = results.get("news", {})
+    reddit_data = results.get("reddit", {})
+
+    print("Generating broadcast summary...")
+    # Generate summary using Gemini
+    news_summary = await asyncio.to_thread(
+        generate_broadcast_news,
+        api_key=get_settings().gemini_api_key,
+        news_data=news_data,
+        reddit_data=reddit_data,
+        topics=request.topics
+    )
+
+    print(f"Summary generated: {news_summary[:100]}...")
+
+    # Convert summary to audio using ElevenLabs
+    print("Starting audio conversion...")
+    audio_path = await asyncio.to_thread(synthesize_script, news_summary)
+
+    return build_response(news_summary, audio_path)
+
+
+async def build_topic_script(topic: str, source_type: str, news_scraper: NewsScraper) -> str:
+    """Build one topic's segment script, sharing work with identical in-flight topics"""
+    return await _segment_flights.do(
+        (normalize_topic(topic), source_type),
+        lambda: _build_topic_script(topic, source_type, news_scraper)
+    )
+
+
+async def _build_topic_script(topic: str, source_type: str, news_scraper: NewsScraper) -> str:
+    """Run scrape -> headlines -> script for one topic independently of the others"""
+    news_data, reddit_data = {}, {}
+
+    async def scrape_news():
+        if source_type in ["news", "both"]:
+            summary = await news_scraper.scrape_topic(topic, generate_valid_news_url(topic))
+            news_data["news_analysis"] = {topic: summary}
+
+    async def scrape_reddit():
+        if source_type in ["reddit", "both"]:
+            reddit_data["reddit_analysis"] = {topic: await process_topic_simple(topic)}
+
+    await asyncio.gather(scrape_news(), scrape_reddit())
+
+    script = await asyncio.to_thread(
+        generate_broadcast_news,
+        api_key=get_settings().gemini_api_key,
+        news_data=news_data,
+        reddit_data=reddit_data,
+        topics=[topic]
+    )
+    print(f"Segment script generated for topic: {topic}")
+    return script
+
+
+async def run_topic_chain(topic: str, source_type: str, news_scraper: NewsScraper) -> Dict:
+    """Run scrape -> headlines -> script -> TTS for one topic independently of the others"""
+    script = await build_topic_script(topic, source_type, news_scraper)
+
+    audio_path = await asyncio.to_thread(synthesize_script, script)
+    print(f"Segment audio generated for topic: {topic}: {audio_path}")
+
+    return {"topic": topic, "summary": script, "audio_path": audio_path}
+
+
+async def run_pipelined_broadcast(request: NewsRequest) -> Dict:
+    """Generate a broadcast with every topic moving through its own pipeline, then stitch the segments"""
+    news_scraper = NewsScraper()
+    segments: List[Dict] = await asyncio.gather(*(
+        run_topic_chain(topic, request.source_type, news_scraper) for topic in request.topics
+    ))
+
+    news_summary = "\n\n".join(segment["summary"] for segment in segments)
+    audio_path = await asyncio.to_thread(
+        concatenate_audio_files,
+        [segment["audio_path"] for segment in segments],
+        AUDIO_DIR,
+        lambda index: synthesize_script(segments[index]["summary"])
+    )
+
+    return build_response(news_summary, audio_path)
+
+
+async def run_request(request: NewsRequest) -> Dict:
+    """Generate a broadcast using the mode selected on the request"""
+    if request.pipelined:
+        print("Running pipelined per-topic generation...")
+        return await run_pipelined_broadcast(request)
+    return await run_broadcast(request)
+
+
+async def iterate_in_thread(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Drain a blocking iterator from a worker thread without stalling the event loop"""
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+async def stream_pipelined_broadcast(request: NewsRequest) -> AsyncIterator[bytes]:
+    """Yield MP3 frames topic by topic while later topics are still being scraped and scripted.
+
+    Each provider response is reduced to its audio frames, so no per-response
+    tags or Xing headers end up mid-stream, and every frame must match the
+    format the stream started with. A topic that fails, or whose audio comes
+    back in another format (e.g. a gTTS fallback after ElevenLabs), is left
+    out and StreamingAudioError is raised once the other topics have been
+    streamed, so the client sees a failed transfer instead of a clean end.
+    """
+    news_scraper = NewsScraper()
+    scripts = [
+        asyncio.create_task(build_topic_script(topic, request.source_type, news_scraper))
+        for topic in request.topics
+    ]
+    expected_format = None
+    failed_topics = []
+
+    try:
+        for topic, script_task in zip(request.topics, scripts):
+            try:
+                script = await script_task
+            except Exception as e:
+                print(f"Skipping audio for topic {topic}: {str(e)}")
+                failed_topics.append(topic)
+                continue
+
+            print(f"Streaming audio for topic: {topic}")
+            audio_chunks = stream_text_to_audio(
+                text=script,
+                voice_id=TTS_VOICE_ID,
+                model_id=TTS_MODEL_ID,
+                output_format=TTS_OUTPUT_FORMAT
+            )
+            try:
+                async for chunk in iterate_in_thread(audio_chunks):
+                    found = stream_format(chunk)
+                    if found is None:
+                        continue
+                    if expected_format is None:
+                        expected_format = found
+                    elif found != expected_format:
+                        raise MP3FormatError(f"{describe_format(found)} audio can't follow the stream's "
+                                             f"{describe_format(expected_format)} audio")
+                    yield audio_frames(chunk)
+            except Exception as e:
+                print(f"Stopping audio for topic {topic}: {str(e)}")
+                failed_topics.append(topic)
+
+        if failed_topics:
+            raise StreamingAudioError(f"No complete audio for topics: {', '.join(failed_topics)}")
+    finally:
+        # Stop waiting on scripts this stream no longer needs. The work itself runs in shielded
+        # single-flight tasks, so it still finishes for other requests and lands in the cache.
+        for script_task in scripts:
+            script_task.cancel()
+
+
+async def stream_broadcast_events(request: NewsRequest) -> AsyncIterator[Dict]:
+    """Yield broadcast progress events: script text as Gemini writes it and audio as each sentence is voiced.
+
+    Finished sentences go to TTS while the rest of the script is still being
+    generated. Events are {"event": name, "data": {...}} with names "status",
+    "script" (a text delta), "audio" (a stored segment), "error" and finally
+    "done" (the full summary and the joined audio file).
+    """
+    started = time.perf_counter()
+    yield {"event": "status", "data": {"stage": "scraping"}}
+
+    async def scrape_news():
+        if request.source_type in ["news", "both"]:
+            return await NewsScraper().scrape_news(request.topics)
+        return {}
+
+    async def scrape_reddit():
+        if request.source_type in ["reddit", "both"]:
+            return await scrape_reddit_topics(request.topics)
+        return {}
+
+    news_data, reddit_data = await asyncio.gather(scrape_news(), scrape_reddit())
+    yield {"event": "status", "data": {"stage": "writing", "elapsed_s": round(time.perf_counter() - started, 3)}}
+
+    events: asyncio.Queue = asyncio.Queue()
+    pieces: asyncio.Queue = asyncio.Queue()
+    script_parts: List[str] = []
+    segment_paths: List[str] = []
+    segment_texts: List[str] = []
+    synthesizer = IncrementalSynthesizer(TTS_VOICE_ID, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+    store = get_artifact_store(AUDIO_DIR)
+    finished = object()
+
+    async def write_script() -> None:
+        buffer = SentenceBuffer(min_chars=int(os.getenv("TTS_STREAM_MIN_CHARS", "200")))
+        try:
+            async for text in astream_broadcast_news(get_settings().gemini_api_key, news_data, reddit_data,
+                                                     request.topics):
+                script_parts.append(text)
+                events.put_nowait({"event": "script", "data": {"text": text}})
+                for piece in buffer.feed(text):
+                    pieces.put_nowait(piece)
+            for piece in buffer.flush():
+                pieces.put_nowait(piece)
+        except Exception as e:
+            print(f"Streaming broadcast script failed: {str(e)}")
+            events.put_nowait({"event": "error", "data": {"stage": "script", "message": str(e)}})
+        finally:
+            pieces.put_nowait(finished)
+            events.put_nowait(finished)
+
+    async def speak() -> None:
+        try:
+            while (piece := await pieces.get()) is not finished:
+                audio = await asyncio.to_thread(synthesizer.synthesize, piece)
+                if not audio:
+                    events.put_nowait({"event": "error", "data": {"stage": "tts", "text": piece}})
+                    continue
+                path = await asyncio.to_thread(store.put, audio, ".mp3", "tts")
+                segment_paths.append(path)
+                segment_texts.append(piece)
+                events.put_nowait({"event": "audio", "data": {
+                    "index": len(segment_paths) - 1,
+                    "audio_path": path,
+                    "url": f"/download-audio/{os.path.basename(path)}",
+                    "provider": synthesizer.provider,
+                    "text": piece
+                }})
+        finally:
+            events.put_nowait(finished)
+
+    tasks = [asyncio.create_task(write_script()), asyncio.create_task(speak())]
+    first_text_s = first_audio_s = None
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await events.get()
+            if event is finished:
+                remaining -= 1
+                continue
+            elapsed = round(time.perf_counter() - started, 3)
+            if event["event"] == "script" and first_text_s is None:
+                first_text_s = elapsed
+            if event["event"] == "audio" and first_audio_s is None:
+                first_audio_s = elapsed
+                print(f"First audio segment ready after {elapsed}s")
+            yield event
+
+        audio_path = await asyncio.to_thread(concatenate_audio_files, segment_paths, AUDIO_DIR,
+                                             lambda index: synthesize_script(segment_texts[index]))
+        response = build_response("".join(script_parts), audio_path)
+        response.update(first_text_s=first_text_s, first_audio_s=first_audio_s,
+                        total_s=round(time.perf_counter() - started, 3))
+        yield {"event": "done", "data": response}
+    finally:
+        # Client went away or we finished: don't leave generation or synthesis running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,170 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models import NewsRequest
+from news_scraper import NewsScraper
+from cache import get_cache
+from metrics import start_trace
+from shared_state import get_state
+from utils import normalize_topic, invalidate_headlines
+from tts import synthesize_text
+from pipeline import build_topic_script, TTS_VOICE_ID, TTS_MODEL_ID, TTS_OUTPUT_FORMAT
+
+
+class TopicTracker:
+    """Decaying request counts per (topic, source type), so recent popularity wins"""
+
+    def __init__(self, decay: float = 0.5):
+        self.decay = decay
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], float] = {}
+        self._display: Dict[str, str] = {}
+
+    def record(self, request: NewsRequest) -> None:
+        with self._lock:
+            for topic in request.topics:
+                key = (normalize_topic(topic), request.source_type)
+                self._counts[key] = self._counts.get(key, 0.0) + 1
+                self._display.setdefault(key[0], topic)
+
+    def top(self, k: int, min_count: float = 1.0) -> List[Tuple[str, str]]:
+        """The k most requested (topic, source type) pairs with at least min_count requests"""
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+            return [(self._display[topic], source_type) for (topic, source_type), count in ranked[:k]
+                    if count >= min_count]
+
+    def decay_counts(self) -> None:
+        """Age every count so topics that stop being requested drop out of the top K"""
+        with self._lock:
+            for key in list(self._counts):
+                self._counts[key] *= self.decay
+                if self._counts[key] < 0.1:
+                    del self._counts[key]
+            active = {topic for topic, _ in self._counts}
+            self._display = {topic: name for topic, name in self._display.items() if topic in active}
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [{"topic": self._display[topic], "source_type": source_type, "score": round(count, 2)}
+                    for (topic, source_type), count in sorted(self._counts.items(), key=lambda item: -item[1])]
+
+
+class Prewarmer:
+    """Periodically refreshes scrape -> headlines -> script (and optionally TTS) for popular topics.
+
+    Refreshed pages, summaries, scripts and audio land in the disk cache, so
+    live requests for warm topics are served from there. Refreshes run at
+    most `concurrency` at a time, stop launching once a cycle has used
+    `budget_seconds`, and are skipped while is_busy() reports live work.
+    """
+
+    def __init__(self, tracker: TopicTracker, top_k: int = 5, interval: float = 900, jitter: float = 0.1,
+                 concurrency: int = 1, budget_seconds: float = 120, min_requests: float = 2,
+                 include_tts: bool = False, is_busy: Optional[Callable[[], bool]] = None):
+        self.tracker = tracker
+        self.top_k = top_k
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.budget_seconds = budget_seconds
+        self.min_requests = min_requests
+        self.include_tts = include_tts
+        self.is_busy = is_busy or (lambda: False)
+        self.last_cycle: Dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if get_cache() is None:
+            print("Pre-warming disabled: it needs the disk cache to hold refreshed results")
+            return
+        self._task = asyncio.create_task(self._run())
+        print(f"Pre-warming top {self.top_k} topics every {self.interval:.0f}s")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # Jitter keeps several app processes from refreshing in lockstep
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                print(f"Pre-warm cycle failed: {str(e)}")
+
+    async def run_cycle(self) -> Dict:
+        """Refresh the current top-K topics once, within the concurrency cap and time budget"""
+        # With several worker processes only one of them pre-warms per cycle
+        state, holder = get_state(), f"{os.getpid()}:prewarm"
+        if not await asyncio.to_thread(state.try_acquire, "prewarm", 1, holder, self.budget_seconds + 60):
+            print("Another worker is pre-warming; skipping this cycle")
+            return {}
+        try:
+            return await self._refresh_top_topics()
+        finally:
+            await asyncio.to_thread(state.release, "prewarm", holder)
+
+    async def _refresh_top_topics(self) -> Dict:
+        topics = self.tracker.top(self.top_k, self.min_requests)
+        self.tracker.decay_counts()
+        started = time.monotonic()
+        limiter = asyncio.Semaphore(self.concurrency)
+        # Refreshes share one scraper so they also respect its scrape concurrency cap
+        news_scraper = NewsScraper(max_concurrency=self.concurrency)
+        refreshed, skipped = [], []
+
+        async def refresh(topic: str, source_type: str) -> None:
+            async with limiter:
+                if time.monotonic() - started > self.budget_seconds or await asyncio.to_thread(self.is_busy):
+                    skipped.append(topic)
+                    return
+                try:
+                    with start_trace(f"prewarm {topic}", route="prewarm"):
+                        await self.refresh_topic(topic, source_type, news_scraper)
+                    refreshed.append(topic)
+                except Exception as e:
+                    print(f"Pre-warming {topic} failed: {str(e)}")
+                    skipped.append(topic)
+
+        await asyncio.gather(*(refresh(topic, source_type) for topic, source_type in topics))
+        self.last_cycle = {
+            "finished": time.time(),
+            "duration_s": round(time.monotonic() - started, 3),
+            "refreshed": refreshed,
+            "skipped": skipped
+        }
+        print(f"Pre-warmed {len(refreshed)} topics, skipped {len(skipped)}")
+        return self.last_cycle
+
+    async def refresh_topic(self, topic: str, source_type: str, news_scraper: NewsScraper) -> None:
+        if source_type in ["news", "both"]:
+            await asyncio.to_thread(invalidate_headlines, topic)
+        script = await build_topic_script(topic, source_type, news_scraper)
+        if self.include_tts:
+            await asyncio.to_thread(synthesize_text, script, TTS_VOICE_ID, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+        print(f"Pre-warmed topic: {topic} ({source_type})")
+
+
+def create_prewarmer(is_busy: Optional[Callable[[], bool]] = None) -> Optional[Prewarmer]:
+    """Build the pre-warmer from environment configuration, or None when it is disabled"""
+    if os.getenv("PREWARM_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return Prewarmer(
+        tracker=TopicTracker(),
+        top_k=int(os.getenv("PREWARM_TOP_K", "5")),
+        interval=float(os.getenv("PREWARM_INTERVAL_SECONDS", "900")),
+        jitter=float(os.getenv("PREWARM_JITTER", "0.1")),
+        concurrency=int(os.getenv("PREWARM_CONCURRENCY", "1")),
+        budget_seconds=float(os.getenv("PREWARM_BUDGET_SECONDS", "120")),
+        min_requests=float(os.getenv("PREWARM_MIN_REQUESTS", "2")),
+        include_tts=os.getenv("PREWARM_TTS", "false").lower() in ("1", "true", "yes"),
+        is_busy=is_busy
+    )
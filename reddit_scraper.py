@@ -1,31 +1,178 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import os
+import json
 import asyncio
+import email.utils
+import time
+
+import httpx
+
+from cache import get_cache, make_key
+from metrics import span, observe, FETCHED_BYTES
+from singleflight import SingleFlight
+from resilience import CircuitOpenError, provider_slot
+from utils import get_http_client, normalize_topic
+
+# Repeat requests for a topic share one fetch, which also keeps the incremental state consistent
+_reddit_flights = SingleFlight()
+# Newest post id and retained posts per topic, used when the disk cache is disabled
+_topic_state: Dict[str, Dict] = {}
+
+MAX_RETRIES = 4
+
+
+def reddit_base_url() -> str:
+    """Base URL of the Reddit JSON API, overridable to point at a fixture server"""
+    return os.getenv("REDDIT_BASE_URL", "https://www.reddit.com").rstrip("/")
+
+
+def retry_after_seconds(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited response, honouring Retry-After"""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            if retry_at is not None:
+                return max(0.0, retry_at.timestamp() - time.time())
+    return min(30.0, 0.5 * 2 ** attempt)
+
+
+async def fetch_json(path: str, params: Dict[str, Any]) -> Any:
+    """GET a Reddit JSON endpoint, backing off on 429 and 5xx responses"""
+    url = f"{reddit_base_url()}{path}"
+    for attempt in range(MAX_RETRIES + 1):
+        async with provider_slot("reddit") as call:
+            with span("reddit", path=path.split("/")[1]):
+                response = await get_http_client().get(url, params={**params, "raw_json": 1})
+            call.record_status(response.status_code)
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt == MAX_RETRIES:
+                response.raise_for_status()
+            delay = retry_after_seconds(response, attempt)
+            print(f"Reddit returned {response.status_code} for {path}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        response.raise_for_status()
+        observe(FETCHED_BYTES, "reddit", len(response.content))
+        return response.json()
+
+
+async def search_posts(topic: str, limit: int, before: Optional[str] = None) -> List[Dict]:
+    """Newest posts matching a topic, only those newer than the `before` post id if given"""
+    params = {"q": topic, "sort": "new", "limit": limit, "type": "link"}
+    if before:
+        params["before"] = f"t3_{before}"
+    listing = await fetch_json("/search.json", params)
+    posts = []
+    for child in listing.get("data", {}).get("children", []):
+        post = child.get("data", {})
+        if post.get("id"):
+            posts.append({
+                "id": post["id"],
+                "title": post.get("title", ""),
+                "subreddit": post.get("subreddit", ""),
+                "score": post.get("score", 0),
+                "num_comments": post.get("num_comments", 0),
+                "created_utc": post.get("created_utc", 0),
+                "comments": []
+            })
+    return posts
+
+
+async def top_comments(post_id: str, limit: int) -> List[str]:
+    """Bodies of a post's top-level comments, highest voted first"""
+    listings = await fetch_json(f"/comments/{post_id}.json", {"sort": "top", "limit": limit, "depth": 1})
+    if not isinstance(listings, list) or len(listings) < 2:
+        return []
+    comments = []
+    for child in listings[1].get("data", {}).get("children", []):
+        if child.get("kind") != "t1":
+            continue
+        body = " ".join(child.get("data", {}).get("body", "").split())
+        if body and body not in ("[deleted]", "[removed]"):
+            comments.append(body)
+    return comments[:limit]
+
+
+def load_topic_state(topic: str) -> Dict:
+    cache = get_cache()
+    if cache:
+        stored = cache.get_text("reddit", make_key(topic))
+        return json.loads(stored) if stored else {"newest_id": None, "posts": []}
+    return _topic_state.get(topic, {"newest_id": None, "posts": []})
+
+
+def save_topic_state(topic: str, state: Dict) -> None:
+    cache = get_cache()
+    if cache:
+        cache.set_text("reddit", make_key(topic), json.dumps(state))
+    else:
+        _topic_state[topic] = state
+
+
+async def fetch_topic_posts(topic: str) -> List[Dict]:
+    """Posts and top comments for a topic, fetching only posts newer than the last fetch"""
+    max_posts = int(os.getenv("REDDIT_MAX_POSTS", "10"))
+    comments_per_post = int(os.getenv("REDDIT_COMMENTS_PER_POST", "3"))
+    key = normalize_topic(topic)
+
+    state = await asyncio.to_thread(load_topic_state, key)
+    try:
+        new_posts = await search_posts(topic, max_posts, state["newest_id"])
+    except CircuitOpenError:
+        if not state["posts"]:
+            raise
+        # Reddit is failing; the posts retained from the last fetch are better than nothing
+        print(f"Reddit unavailable, using {len(state['posts'])} retained posts for {topic}")
+        return state["posts"]
+    if new_posts:
+        comment_lists = await asyncio.gather(
+            *(top_comments(post["id"], comments_per_post) for post in new_posts if post["num_comments"]),
+            return_exceptions=True
+        )
+        for post, comments in zip([post for post in new_posts if post["num_comments"]], comment_lists):
+            post["comments"] = [] if isinstance(comments, Exception) else comments
+
+        known = {post["id"] for post in new_posts}
+        state = {
+            "newest_id": new_posts[0]["id"],
+            "posts": (new_posts + [post for post in state["posts"] if post["id"] not in known])[:max_posts]
+        }
+        await asyncio.to_thread(save_topic_state, key, state)
+    print(f"Reddit: {len(new_posts)} new posts for {topic} ({len(state['posts'])} retained)")
+    return state["posts"]
+
+
+def format_discussion(topic: str, posts: List[Dict]) -> str:
+    """Render posts and comments as the discussion context handed to the broadcast writer"""
+    if not posts:
+        return f"No recent Reddit discussions found about {topic}."
+    lines = [f"Recent Reddit discussions about {topic}:"]
+    for post in sorted(posts, key=lambda post: post["score"], reverse=True):
+        lines.append(f"- r/{post['subreddit']}: \"{post['title']}\" ({post['score']} points, "
+                     f"{post['num_comments']} comments)")
+        for comment in post["comments"]:
+            lines.append(f"    Comment: \"{comment[:300]}\"")
+    return "\n".join(lines)
+
 
 async def scrape_reddit_topics(topics: List[str]) -> Dict[str, Dict]:
     """Process list of topics and return analysis results"""
     try:
-        reddit_results = {}
-        
-        for topic in topics:
-            summary = await process_topic_simple(topic)
-            reddit_results[topic] = summary
-            await asyncio.sleep(1)
-
-        return {"reddit_analysis": reddit_results}
-    
+        summaries = await asyncio.gather(*(process_topic_simple(topic) for topic in topics))
+        return {"reddit_analysis": dict(zip(topics, summaries))}
+
     except Exception as e:
         print(f"Reddit scraping error: {str(e)}")
         return {"reddit_analysis": {topic: f"Error analyzing {topic}" for topic in topics}}
 
 async def process_topic_simple(topic: str) -> str:
-    """Simplified topic analysis"""
+    """Recent Reddit posts and top comments for a topic, formatted for the broadcast writer"""
     try:
-        await asyncio.sleep(0.5)
-        
-        return f"""Based on Reddit discussions about {topic}, users are generally engaged with mixed sentiment. 
-        Key discussion points include recent developments, community opinions, and related news. 
-        The overall tone appears to be cautiously optimistic with some concerns raised about implementation details. 
-        Popular comments focus on practical applications and potential impact on daily life."""
-        
+        posts = await _reddit_flights.do(normalize_topic(topic), lambda: fetch_topic_posts(topic))
+        return format_discussion(topic, posts)
+
     except Exception as e:
         return f"Error processing Reddit topic {topic}: {str(e)}"
@@ -0,0 +1,307 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from shared_state import ProviderSlot, provider_limits
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} circuit open, retrying in {retry_in:.0f}s")
+        self.provider = provider
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for candidate in (getattr(error, "status_code", None),
+                      getattr(getattr(error, "response", None), "status_code", None),
+                      getattr(error, "code", None)):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def classify(error: Optional[BaseException]) -> str:
+    """"ok", "throttled" or "failed" for the outcome of a provider call"""
+    if error is None:
+        return "ok"
+    status = _status_code(error)
+    if status == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return "throttled"
+    # Client errors (a 404 for one page, a bad request) say nothing about the provider's health
+    if status is not None and status < 500:
+        return "ok"
+    return "failed"
+
+
+class ProviderGuard:
+    """Circuit breaker and AIMD concurrency limit for one provider.
+
+    The concurrency limit grows by one per limit's worth of healthy calls
+    and halves (at most once per second) on a 429 or a call slower than
+    latency_target. After failure_threshold consecutive failures or 429s
+    the circuit opens and calls fail fast with CircuitOpenError for
+    cooldown_seconds, after which a single probe call decides whether it
+    closes again.
+    """
+
+    def __init__(self, provider: str, max_concurrency: int, rate: float = 0, failure_threshold: int = 5,
+                 cooldown_seconds: float = 30, latency_target: float = 0, min_concurrency: int = 1):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency) if max_concurrency else 0
+        self.rate = rate
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latency_target = latency_target
+        self._lock = threading.Lock()
+        self._limit = float(max_concurrency)
+        self._last_decrease = 0.0
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._latencies = deque(maxlen=200)
+        self.counts = {"ok": 0, "throttled": 0, "failed": 0, "rejected": 0}
+
+    @property
+    def concurrency(self) -> int:
+        """Current adaptive concurrency limit (0 means unlimited)"""
+        return int(self._limit)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.cooldown_seconds else "open"
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpenError; returns True if the call is the half-open probe"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.counts["rejected"] += 1
+            raise CircuitOpenError(self.provider, max(0.0, self.cooldown_seconds - (now - self._opened_at)))
+
+    def record(self, outcome: str, latency: float, probe: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.counts[outcome] += 1
+            if probe:
+                self._probing = False
+            if outcome == "ok":
+                self._latencies.append(latency)
+                self._consecutive_failures = 0
+                if self._opened_at is not None:
+                    print(f"{self.provider} circuit closed")
+                self._opened_at = None
+                if self.latency_target and latency > self.latency_target:
+                    self._decrease(now)
+                elif self._limit:
+                    self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+                return
+
+            if outcome == "throttled":
+                self._decrease(now)
+            self._consecutive_failures += 1
+            if probe or (self._opened_at is None and self._consecutive_failures >= self.failure_threshold):
+                self._opened_at = now
+                print(f"{self.provider} circuit opened after {self._consecutive_failures} failures; "
+                      f"using fallbacks for {self.cooldown_seconds:.0f}s")
+
+    @property
+    def failing(self) -> bool:
+        """Whether the last call failed, or the circuit isn't closed"""
+        return self._consecutive_failures > 0 or self._opened_at is not None
+
+    def end_probe(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def _decrease(self, now: float) -> None:
+        # Calls already in flight when the provider pushed back report together; count that as one signal
+        if self._limit and now - self._last_decrease >= 1.0:
+            self._limit = max(self.min_concurrency, self._limit / 2)
+            self._last_decrease = now
+
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < 20:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def snapshot(self) -> Dict:
+        p95 = self.latency_quantile(0.95)
+        return {
+            "state": self.state,
+            "concurrency": self.concurrency,
+            "max_concurrency": self.max_concurrency,
+            "rate_per_second": self.rate,
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+            "calls": dict(self.counts)
+        }
+
+
+class GuardedCall:
+    """One provider call: checks the breaker, holds a slot within the adaptive limit, records the outcome.
+
+    Usable as a blocking or async context manager. Calls that report their
+    status without raising (e.g. a 429 the caller retries itself) pass it to
+    record_status().
+    """
+
+    def __init__(self, guard: ProviderGuard):
+        self.guard = guard
+        self._slot: Optional[ProviderSlot] = None
+        self._probe = False
+        self._status: Optional[int] = None
+        self._started = 0.0
+
+    def record_status(self, status_code: int) -> None:
+        self._status = status_code
+
+    def _enter(self) -> ProviderSlot:
+        self._probe = self.guard.before_call()
+        self._slot = ProviderSlot(self.guard.provider, self.guard.concurrency, self.guard.rate)
+        return self._slot
+
+    def _abandon(self) -> None:
+        if self._probe:
+            self.guard.end_probe()
+
+    def _outcome(self, error: Optional[BaseException]) -> Optional[str]:
+        if isinstance(error, asyncio.CancelledError):
+            return None
+        if error is None and self._status is not None:
+            error = _StatusError(self._status)
+        return classify(error)
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        outcome = self._outcome(error)
+        if outcome is None:
+            # A cancelled call (e.g. the losing side of a hedge) says nothing about the provider
+            self._abandon()
+            return
+        self.guard.record(outcome, time.monotonic() - self._started, self._probe)
+
+    def __enter__(self):
+        try:
+            self._enter().__enter__()
+        except BaseException:
+            self._abandon()
+            raise
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slot.__exit__(exc_type, exc, tb)
+        self._finish(exc)
+        return False
+
+    async def __aenter__(self):
+        slot = self._enter()
+        try:
+            await slot.__aenter__()
+        except BaseException:
+            self._abandon()
+            raise
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._slot.__aexit__(exc_type, exc, tb)
+        self._finish(exc)
+        return False
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(provider: str) -> ProviderGuard:
+    """Return this process's guard for a provider, configured from the environment"""
+    with _guards_lock:
+        guard = _guards.get(provider)
+        if guard is None:
+            name = provider.upper()
+            concurrency, rate = provider_limits(provider)
+            guard = _guards[provider] = ProviderGuard(
+                provider,
+                max_concurrency=concurrency,
+                rate=rate,
+                failure_threshold=int(os.getenv(f"CIRCUIT_FAILURE_THRESHOLD_{name}",
+                                                os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))),
+                cooldown_seconds=float(os.getenv(f"CIRCUIT_COOLDOWN_SECONDS_{name}",
+                                                 os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))),
+                latency_target=float(os.getenv(f"PROVIDER_LATENCY_TARGET_{name}", "0"))
+            )
+        return guard
+
+
+def provider_slot(provider: str) -> GuardedCall:
+    """Guard one outbound call to a provider: breaker, rate and adaptive concurrency limits"""
+    return GuardedCall(get_guard(provider))
+
+
+def provider_status() -> Dict[str, Dict]:
+    with _guards_lock:
+        guards = dict(_guards)
+    return {provider: guard.snapshot() for provider, guard in sorted(guards.items())}
+
+
+async def hedged(call: Callable[[], Awaitable], delay: Optional[float], max_attempts: int = 2):
+    """Run call(), starting another attempt whenever `delay` passes without a result.
+
+    The first attempt to succeed wins and the others are cancelled; if every
+    attempt fails the last error is raised. A delay of None disables hedging.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    last_error: Optional[BaseException] = None
+    try:
+        while tasks:
+            can_hedge = delay is not None and len(tasks) < max_attempts
+            done, _ = await asyncio.wait(tasks, timeout=delay if can_hedge else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                tasks.append(asyncio.ensure_future(call()))
+                continue
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def hedge_delay(provider: str) -> Optional[float]:
+    """Seconds to wait before hedging a call: the provider's observed p95, floored at SCRAPE_HEDGE_SECONDS.
+
+    None (no hedging) while the provider is failing, when a second request would only double the load.
+    """
+    guard = get_guard(provider)
+    if os.getenv("SCRAPE_HEDGE_ENABLED", "true").lower() in ("0", "false", "no") or guard.failing:
+        return None
+    floor = float(os.getenv("SCRAPE_HEDGE_SECONDS", "2"))
+    p95 = guard.latency_quantile(0.95)
+    return max(floor, p95) if p95 is not None else floor * 2
@@ -0,0 +1,53 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+def _flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Provider credentials and startup options, read from the environment (and .env) once"""
+
+    gemini_api_key: Optional[str]
+    elevenlabs_api_key: Optional[str]
+    brightdata_user: Optional[str]
+    brightdata_pass: Optional[str]
+    brightdata_host: str
+    brightdata_port: int
+    provider_warmup: bool
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            gemini_api_key=os.getenv("GEMINI_API_KEY"),
+            elevenlabs_api_key=os.getenv("ELEVENLABS_API_KEY"),
+            brightdata_user=os.getenv("BRIGHTDATA_USER"),
+            brightdata_pass=os.getenv("BRIGHTDATA_PASS"),
+            brightdata_host=os.getenv("BRIGHTDATA_HOST", "zproxy.lum-superproxy.io"),
+            brightdata_port=int(os.getenv("BRIGHTDATA_PORT", "22225")),
+            provider_warmup=_flag("PROVIDER_WARMUP")
+        )
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, loading .env into the environment on first use.
+
+    Tuning knobs elsewhere are still read with os.getenv when used, so
+    loading .env here first makes them visible too.
+    """
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            load_dotenv()
+            _settings = Settings.from_env()
+        return _settings
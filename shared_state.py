@@ -0,0 +1,300 @@
+import os
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Dict, List, Tuple
+
+from metrics import span
+
+# Upper bound on how long a crashed worker can hold a slot
+DEFAULT_LEASE_SECONDS = 300
+
+# Default global concurrency per outbound provider (overridable with PROVIDER_CONCURRENCY_<NAME>,
+# or REDDIT_CONCURRENCY for Reddit)
+DEFAULT_PROVIDER_CONCURRENCY = {
+    "brightdata": 10,
+    "gemini": 8,
+    "elevenlabs": 4,
+    "gtts": 4,
+    "reddit": 4,
+}
+
+
+def shared_state_enabled() -> bool:
+    return os.getenv("SHARED_STATE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class LocalState:
+    """In-process slot counters and token buckets, used when running a single worker.
+
+    Callers waiting for a slot are woken when one is released rather than
+    polling: threads through a Condition, coroutines through futures resolved
+    on their own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._slots: Dict[str, set] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._async_waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+
+    def try_acquire(self, name: str, limit: int, holder: str, lease_seconds: float) -> bool:
+        with self._lock:
+            holders = self._slots.setdefault(name, set())
+            if len(holders) >= limit:
+                return False
+            holders.add(holder)
+            return True
+
+    def acquire(self, name: str, limit: int, holder: str) -> None:
+        """Block the calling thread until a slot is free, then take it"""
+        with self._released:
+            holders = self._slots.setdefault(name, set())
+            while len(holders) >= limit:
+                self._released.wait()
+            holders.add(holder)
+
+    async def acquire_async(self, name: str, limit: int, holder: str) -> None:
+        """Wait without blocking the event loop until a slot is free, then take it"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                holders = self._slots.setdefault(name, set())
+                if len(holders) < limit:
+                    holders.add(holder)
+                    return
+                # Registered under the lock, so a release between the check and the wait can't be missed
+                waiter = (loop, loop.create_future())
+                self._async_waiters.setdefault(name, []).append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._lock:
+                    if waiter in self._async_waiters.get(name, []):
+                        self._async_waiters[name].remove(waiter)
+
+    def release(self, name: str, holder: str) -> None:
+        with self._lock:
+            self._slots.get(name, set()).discard(holder)
+            # Wake every waiter: limits can differ between callers, and each rechecks its own
+            self._released.notify_all()
+            waiters = self._async_waiters.pop(name, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def in_use(self, name: str) -> int:
+        with self._lock:
+            return len(self._slots.get(name, ()))
+
+    def take_tokens(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Take tokens if available and return 0, otherwise return the seconds until they will be"""
+        with self._lock:
+            now = time.monotonic()
+            available, updated = self._buckets.get(name, (capacity, now))
+            available = min(capacity, available + (now - updated) * rate)
+            if available >= tokens:
+                self._buckets[name] = (available - tokens, now)
+                return 0.0
+            self._buckets[name] = (available, now)
+            return (tokens - available) / rate
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SharedState:
+    """Slot counters and token buckets shared by every worker process through SQLite in WAL mode.
+
+    Slots carry a lease so a worker that dies mid-call can't hold them forever.
+    """
+
+    def __init__(self, path: str = "shared_state.db"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            "name TEXT NOT NULL, holder TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (name, holder))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._db.execute("COMMIT")
+                return result
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def try_acquire(self, name: str, limit: int, holder: str, lease_seconds: float) -> bool:
+        def acquire():
+            now = time.time()
+            self._db.execute("DELETE FROM slots WHERE name = ? AND expires < ?", (name, now))
+            in_use = self._db.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()[0]
+            if in_use >= limit:
+                return False
+            self._db.execute("INSERT INTO slots (name, holder, expires) VALUES (?, ?, ?)",
+                             (name, holder, now + lease_seconds))
+            return True
+
+        return self._transaction(acquire)
+
+    def release(self, name: str, holder: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM slots WHERE name = ? AND holder = ?", (name, holder))
+
+    def in_use(self, name: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM slots WHERE name = ? AND expires >= ?", (name, time.time())
+            ).fetchone()[0]
+
+    def take_tokens(self, name: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """Take tokens if available and return 0, otherwise return the seconds until they will be"""
+        def take():
+            now = time.time()
+            row = self._db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            available, updated = row if row else (capacity, now)
+            available = min(capacity, available + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / rate
+            self._db.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                             (name, available, now))
+            return wait
+
+        return self._transaction(take)
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    """Return the process-wide limit state: SQLite-backed when workers share it, in-process otherwise"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            if shared_state_enabled():
+                _state = SharedState(os.getenv("SHARED_STATE_DB", "shared_state.db"))
+            else:
+                _state = LocalState()
+        return _state
+
+
+class ProviderSlot:
+    """One use of a provider, held within its global concurrency and rate limits.
+
+    Usable as a blocking context manager (from worker threads) or an async
+    one (from the event loop). In a single process a waiter is woken as soon
+    as a slot is released; with SHARED_STATE_ENABLED the slots may be held by
+    other processes, so waiting polls with a short backoff instead.
+    """
+
+    def __init__(self, provider: str, concurrency: int, rate: float, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.rate = rate
+        self.lease_seconds = lease_seconds
+        self.holder = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._has_token = False
+
+    def _take_token(self) -> float:
+        """Take a rate token if one is needed; returns 0 on success or the seconds until one is available"""
+        # The token is kept across retries so waiting for a slot doesn't burn the rate budget
+        if self.rate > 0 and not self._has_token:
+            wait = get_state().take_tokens(f"rate:{self.provider}", self.rate, max(1.0, self.rate))
+            if wait > 0:
+                return wait
+            self._has_token = True
+        return 0.0
+
+    def _try(self) -> float:
+        """Attempt to take a token and a slot; returns 0 on success or the seconds to wait"""
+        wait = self._take_token()
+        if wait:
+            return wait
+        if self.concurrency > 0 and not get_state().try_acquire(
+                f"slot:{self.provider}", self.concurrency, self.holder, self.lease_seconds):
+            return -1.0
+        return 0.0
+
+    def _next_delay(self, wait: float, backoff: float) -> float:
+        return wait if wait > 0 else backoff * random.uniform(0.5, 1.0)
+
+    def __enter__(self):
+        wait = self._try()
+        if wait and not shared_state_enabled():
+            with span("provider_wait", provider=self.provider):
+                while (wait := self._take_token()) > 0:
+                    time.sleep(wait)
+                if self.concurrency > 0:
+                    get_state().acquire(f"slot:{self.provider}", self.concurrency, self.holder)
+        elif wait:
+            with span("provider_wait", provider=self.provider):
+                backoff = 0.01
+                while wait:
+                    time.sleep(self._next_delay(wait, backoff))
+                    backoff = min(backoff * 2, 0.25)
+                    wait = self._try()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.concurrency > 0:
+            get_state().release(f"slot:{self.provider}", self.holder)
+        return False
+
+    async def __aenter__(self):
+        shared = shared_state_enabled()
+
+        async def attempt() -> float:
+            return await asyncio.to_thread(self._try) if shared else self._try()
+
+        wait = await attempt()
+        if wait and not shared:
+            with span("provider_wait", provider=self.provider):
+                while (wait := self._take_token()) > 0:
+                    await asyncio.sleep(wait)
+                if self.concurrency > 0:
+                    await get_state().acquire_async(f"slot:{self.provider}", self.concurrency, self.holder)
+        elif wait:
+            with span("provider_wait", provider=self.provider):
+                backoff = 0.01
+                while wait:
+                    await asyncio.sleep(self._next_delay(wait, backoff))
+                    backoff = min(backoff * 2, 0.25)
+                    wait = await attempt()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.concurrency > 0:
+            if shared_state_enabled():
+                await asyncio.to_thread(get_state().release, f"slot:{self.provider}", self.holder)
+            else:
+                get_state().release(f"slot:{self.provider}", self.holder)
+        return False
+
+
+def provider_limits(provider: str) -> Tuple[int, float]:
+    """(max concurrent calls, calls per second) for a provider; 0 means unlimited"""
+    name = provider.upper()
+    default = DEFAULT_PROVIDER_CONCURRENCY.get(provider, 0)
+    if provider == "reddit":
+        default = int(os.getenv("REDDIT_CONCURRENCY", str(default)))
+    concurrency = int(os.getenv(f"PROVIDER_CONCURRENCY_{name}", str(default)))
+    rate = float(os.getenv(f"PROVIDER_RATE_{name}", "0"))
+    return concurrency, rate
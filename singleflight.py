@@ -0,0 +1,30 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive the same result (or error).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            print(f"Joining in-flight work for {key}")
+
+        # Shield so one caller disconnecting doesn't cancel the work other callers share
+        return await asyncio.shield(task)
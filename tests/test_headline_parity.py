@@ -0,0 +1,38 @@
+"""The streaming headline extractor must match the BeautifulSoup reference path.
+
+Runs benchmarks/bench_headlines.py's parity check on the saved fixtures,
+a synthetic results page and randomised markup, at chunk sizes that split
+tags, entities and text nodes.
+"""
+import os
+import sys
+import glob
+import random
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_headlines import FIXTURES_DIR, check_parity, random_markup, synthetic_news_page
+
+
+def parity_documents() -> dict:
+    documents = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            documents[os.path.basename(path)] = f.read()
+    documents["synthetic_small"] = synthetic_news_page(50)
+    rng = random.Random(1234)
+    for index in range(100):
+        documents[f"random_{index}"] = random_markup(rng)
+    return documents
+
+
+DOCUMENTS = parity_documents()
+
+
+@pytest.mark.parametrize("name", sorted(DOCUMENTS))
+def test_streaming_extractor_matches_reference(name):
+    assert check_parity({name: DOCUMENTS[name]}) == []
@@ -0,0 +1,364 @@
+import io
+import os
+import re
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from cache import get_cache, make_key
+from mp3 import join_mp3
+from metrics import span, observe, SYNTHESIZED_CHARACTERS
+from phrase_library import get_phrase_library, split_stored_phrases
+from resilience import provider_slot
+from settings import get_settings
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Split text with no usable sentence boundary at word boundaries (or hard, for huge words)"""
+    pieces, current = [], ""
+    for word in text.split():
+        while len(word) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        candidate = f"{current} {word}" if current else word
+        if len(candidate) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text_for_tts(text: str, max_chars: int = 2500) -> List[str]:
+    """Split a script into chunks under max_chars, breaking at paragraphs, then sentences, then words"""
+    units = []
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            units.append((paragraph, "\n\n"))
+            continue
+        for sentence in SENTENCE_BREAK.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            pieces = [sentence] if len(sentence) <= max_chars else _split_long(sentence, max_chars)
+            units.extend((piece, " ") for piece in pieces)
+        # The last piece of a paragraph is followed by a paragraph break
+        if units:
+            units[-1] = (units[-1][0], "\n\n")
+
+    chunks, current, separator = [], "", ""
+    for unit, unit_separator in units:
+        candidate = f"{current}{separator}{unit}" if current else unit
+        if len(candidate) > max_chars:
+            chunks.append(current)
+            current = unit
+        else:
+            current = candidate
+        separator = unit_separator
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def synthesize_elevenlabs(text: str, voice_id: str, model_id: str, output_format: str, api_key: str) -> bytes:
+    """Synthesize one chunk with ElevenLabs and return the MP3 bytes"""
+    from elevenlabs.client import ElevenLabs
+
+    client = ElevenLabs(api_key=api_key)
+    audio = client.generate(
+        text=text,
+        voice=voice_id,
+        model=model_id,
+        output_format=output_format
+    )
+    return audio if isinstance(audio, bytes) else b"".join(audio)
+
+
+def synthesize_gtts(text: str) -> bytes:
+    """Synthesize one chunk with Google TTS and return the MP3 bytes"""
+    from gtts import gTTS
+
+    buffer = io.BytesIO()
+    gTTS(text=text, lang='en', slow=False).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+# Library keys of phrases this process is voicing or has voiced for the phrase library
+_filling: Set[str] = set()
+_filling_lock = threading.Lock()
+
+
+def _synthesize_chunks(chunks: List[str], synthesize: Callable[[str], bytes], cache_key: Callable[[str], str],
+                       max_workers: int, provider: str) -> bytes:
+    """Synthesize chunks concurrently (reusing cached chunks) and join them in order.
+
+    When the phrase library is enabled, boilerplate phrases it already holds
+    are spliced in at frame boundaries by join_mp3 and only the text around
+    them is sent to the provider. Phrases it doesn't hold yet are voiced as
+    part of their chunk and, once per process, on their own to fill the library.
+    """
+    cache = get_cache()
+    library = get_phrase_library()
+    stored_phrases: Dict[str, bytes] = {}
+    parts: List[Tuple[str, bool]] = []
+    missing_phrases: List[str] = []
+
+    def lookup_phrase(phrase: str) -> bool:
+        audio = library.get("phrases", cache_key(phrase))
+        if audio is not None:
+            stored_phrases[phrase] = audio
+        return audio is not None
+
+    for chunk in chunks:
+        if library:
+            chunk_parts, missing = split_stored_phrases(chunk, lookup_phrase)
+            parts.extend(chunk_parts)
+            missing_phrases.extend(missing)
+        else:
+            parts.append((chunk, False))
+
+    def synthesize_cached(part: Tuple[str, bool]) -> bytes:
+        text, is_phrase = part
+        if is_phrase:
+            return stored_phrases[text]
+        key = cache_key(text)
+        if cache:
+            cached_audio = cache.get("tts", key)
+            if cached_audio is not None:
+                return cached_audio
+        with provider_slot(provider), span("tts", provider=provider, characters=len(text)):
+            audio = synthesize(text)
+        observe(SYNTHESIZED_CHARACTERS, provider, len(text))
+        if cache and audio:
+            cache.set("tts", key, audio)
+        return audio
+
+    def add_phrase(phrase: str) -> None:
+        try:
+            with provider_slot(provider), span("tts", provider=provider, characters=len(phrase)):
+                audio = synthesize(phrase)
+            observe(SYNTHESIZED_CHARACTERS, provider, len(phrase))
+            if audio:
+                library.set("phrases", cache_key(phrase), audio)
+                print(f"Added phrase to the library: {phrase}")
+        except Exception as e:
+            print(f"Adding phrase to the library failed: {str(e)}")
+            with _filling_lock:
+                _filling.discard(cache_key(phrase))
+
+    with _filling_lock:
+        fills = [phrase for phrase in dict.fromkeys(missing_phrases) if cache_key(phrase) not in _filling]
+        _filling.update(cache_key(phrase) for phrase in fills)
+
+    if len(parts) == 1 and not fills:
+        return join_mp3([synthesize_cached(parts[0])])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(parts) + len(fills))) as pool:
+        # Each part runs in a copy of the caller's context so its span joins the request trace
+        futures = [pool.submit(contextvars.copy_context().run, synthesize_cached, part) for part in parts]
+        # Library fills run alongside the broadcast's own parts; a failed fill is retried by a later script
+        for phrase in fills:
+            pool.submit(contextvars.copy_context().run, add_phrase, phrase)
+        return join_mp3([future.result() for future in futures])
+
+
+def synthesize_text(
+    text: str,
+    voice_id: str = "JBFqnCBsd6RMkJVDRzZb",
+    model_id: str = "eleven_multilingual_v2",
+    output_format: str = "mp3_44100_128",
+    api_key: str = None,
+    max_chars: Optional[int] = None,
+    max_workers: Optional[int] = None
+) -> Optional[bytes]:
+    """Synthesize a full script of any length into one MP3, chunked and in parallel.
+
+    ElevenLabs is tried for every chunk first; if any chunk fails the whole
+    script is redone with gTTS so the broadcast keeps a single voice.
+    Returns None if both providers fail.
+    """
+    api_key = api_key or get_settings().elevenlabs_api_key
+    max_chars = max_chars or int(os.getenv("TTS_MAX_CHARS", "2500"))
+    max_workers = max_workers or int(os.getenv("TTS_CONCURRENCY", "4"))
+
+    chunks = split_text_for_tts(text, max_chars)
+    if not chunks:
+        return None
+    print(f"Synthesizing {len(text)} characters in {len(chunks)} chunks")
+
+    try:
+        return _synthesize_chunks(
+            chunks,
+            lambda chunk: synthesize_elevenlabs(chunk, voice_id, model_id, output_format, api_key),
+            lambda chunk: make_key(chunk, voice_id, model_id, output_format),
+            max_workers,
+            "elevenlabs"
+        )
+    except Exception as eleven_error:
+        print(f"ElevenLabs failed: {str(eleven_error)}")
+
+    try:
+        print("Falling back to Google TTS...")
+        return _synthesize_chunks(
+            chunks,
+            synthesize_gtts,
+            lambda chunk: make_key(chunk, "gtts", "en"),
+            max_workers,
+            "gtts"
+        )
+    except Exception as gtts_error:
+        print(f"Google TTS also failed: {str(gtts_error)}")
+        return None
+
+
+class SentenceBuffer:
+    """Collects text as it streams in and releases it as whole sentences ready for synthesis.
+
+    The first sentence is released on its own so audio can start as early as
+    possible; after that sentences are grouped to at least min_chars, since
+    every TTS call has a fixed overhead.
+    """
+
+    BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+    def __init__(self, min_chars: int = 200, max_chars: int = 2500):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._pending = ""
+        self._released_any = False
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return any groups of complete sentences"""
+        self._pending += text
+        ready, start = [], 0
+        for boundary in self.BOUNDARY.finditer(self._pending):
+            if boundary.end() - start >= (1 if not self._released_any else self.min_chars):
+                ready.append(self._pending[start:boundary.end()].strip())
+                start = boundary.end()
+                self._released_any = True
+        self._pending = self._pending[start:]
+        if len(self._pending) > self.max_chars:
+            # No sentence boundary in sight; fall back to word boundaries
+            *pieces, self._pending = _split_long(self._pending, self.max_chars)
+            ready.extend(pieces)
+        return [group for group in ready if group]
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has ended"""
+        remaining, self._pending = self._pending.strip(), ""
+        return [remaining] if remaining else []
+
+
+class IncrementalSynthesizer:
+    """Synthesizes a script piece by piece as it is written.
+
+    Pieces go to ElevenLabs until it fails, then to gTTS for the rest of the
+    script (pieces already played can't be redone in the other voice).
+    """
+
+    def __init__(self, voice_id: str, model_id: str, output_format: str, api_key: Optional[str] = None):
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+        self.api_key = api_key or get_settings().elevenlabs_api_key
+        self.max_chars = int(os.getenv("TTS_MAX_CHARS", "2500"))
+        self.provider = "elevenlabs"
+
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """MP3 for one piece of the script, or None if both providers fail"""
+        chunks = split_text_for_tts(text, self.max_chars)
+        if not chunks:
+            return None
+        if self.provider == "elevenlabs":
+            try:
+                return _synthesize_chunks(
+                    chunks,
+                    lambda chunk: synthesize_elevenlabs(chunk, self.voice_id, self.model_id,
+                                                        self.output_format, self.api_key),
+                    lambda chunk: make_key(chunk, self.voice_id, self.model_id, self.output_format),
+                    1,
+                    "elevenlabs"
+                )
+            except Exception as eleven_error:
+                print(f"ElevenLabs failed mid-script, continuing with Google TTS: {str(eleven_error)}")
+                self.provider = "gtts"
+        try:
+            return _synthesize_chunks(chunks, synthesize_gtts, lambda chunk: make_key(chunk, "gtts", "en"), 1, "gtts")
+        except Exception as gtts_error:
+            print(f"Google TTS also failed: {str(gtts_error)}")
+            return None
+
+
+def stream_text_to_audio(
+    text: str,
+    voice_id: str = "JBFqnCBsd6RMkJVDRzZb",
+    model_id: str = "eleven_multilingual_v2",
+    output_format: str = "mp3_44100_128",
+    api_key: str = None
+) -> Iterator[bytes]:
+    """Yield one complete MP3 per text chunk as soon as the TTS provider has voiced it, falling back to gTTS.
+
+    Raises the gTTS error if a chunk can't be voiced by either provider.
+    """
+    api_key = api_key or get_settings().elevenlabs_api_key
+    cache = get_cache()
+    use_gtts = False
+
+    for chunk in split_text_for_tts(text, int(os.getenv("TTS_MAX_CHARS", "2500"))):
+        if not use_gtts:
+            audio_key = make_key(chunk, voice_id, model_id, output_format)
+            cached_audio = cache.get("tts", audio_key) if cache else None
+            if cached_audio is not None:
+                yield cached_audio
+                continue
+
+            try:
+                from elevenlabs.client import ElevenLabs
+
+                client = ElevenLabs(api_key=api_key)
+                observe(SYNTHESIZED_CHARACTERS, "elevenlabs", len(chunk))
+                # The slot is released before yielding, so a slow listener never holds a shared provider slot
+                with provider_slot("elevenlabs"), span("tts", provider="elevenlabs", characters=len(chunk)):
+                    audio = b"".join(part for part in client.generate(
+                        text=chunk,
+                        voice=voice_id,
+                        model=model_id,
+                        output_format=output_format,
+                        stream=True
+                    ) if part)
+            except Exception as eleven_error:
+                print(f"ElevenLabs streaming failed: {str(eleven_error)}")
+                use_gtts = True
+                print("Falling back to Google TTS streaming...")
+            else:
+                if cache and audio:
+                    cache.set("tts", audio_key, audio)
+                if audio:
+                    yield audio
+                continue
+
+        try:
+            gtts_key = make_key(chunk, "gtts", "en")
+            audio = cache.get("tts", gtts_key) if cache else None
+            if audio is None:
+                with provider_slot("gtts"), span("tts", provider="gtts", characters=len(chunk)):
+                    audio = synthesize_gtts(chunk)
+                observe(SYNTHESIZED_CHARACTERS, "gtts", len(chunk))
+                if cache:
+                    cache.set("tts", gtts_key, audio)
+            yield audio
+        except Exception as gtts_error:
+            print(f"Google TTS streaming also failed: {str(gtts_error)}")
+            raise
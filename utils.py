@@ -1,66 +1,169 @@
 from urllib.parse import quote_plus
 import os
-import requests
-from fastapi import HTTPException
-from bs4 import BeautifulSoup
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from datetime import datetime
-import uuid
+import httpx
+import asyncio
+import codecs
+import hashlib
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
 
-from dotenv import load_dotenv
+from cache import get_cache, make_key
+from mp3 import join_mp3, stream_format, describe_format
+from artifacts import get_artifact_store
+from metrics import span, observe, FETCHED_BYTES, LLM_TOKENS
+from resilience import CircuitOpenError, provider_slot, hedged, hedge_delay
+from tts import synthesize_text
+from headline_extractor import create_headline_extractor
+from settings import get_settings
 
+# Provider SDKs (langchain, bs4, requests) are imported on first use: they dominate cold-start time
 
-# Load env file
-load_dotenv()
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Pages are read off the network in pieces of this size and parsed as they arrive
+PAGE_CHUNK_BYTES = 64 * 1024
+
+# Pooled async HTTP clients shared by every request handled by this process
+_http_clients = {}
+
+def get_brightdata_proxy_url() -> str:
+    """Build the BrightData super-proxy URL from the environment credentials"""
+    settings = get_settings()
+    return (f"http://{settings.brightdata_user}:{settings.brightdata_pass}"
+            f"@{settings.brightdata_host}:{settings.brightdata_port}")
+
+def get_http_client(proxied: bool = False) -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating the connection pool on first use"""
+    client = _http_clients.get(proxied)
+    if client is None or client.is_closed:
+        max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+        client = httpx.AsyncClient(
+            headers=BROWSER_HEADERS,
+            proxy=get_brightdata_proxy_url() if proxied else None,
+            timeout=30 if proxied else 10,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+        _http_clients[proxied] = client
+    return client
+
+async def close_http_clients() -> None:
+    """Close the shared async HTTP clients (called on app shutdown)"""
+    for client in list(_http_clients.values()):
+        await client.aclose()
+    _http_clients.clear()
+
+def normalize_topic(topic: str) -> str:
+    """Normalise a topic for use as a coalescing or cache key"""
+    return " ".join(topic.lower().split())
 
 def generate_valid_news_url(keyword: str) -> str:
     """Generate a Google News search URL for a keyword"""
     q = quote_plus(keyword)
     return f"https://news.google.com/search?q={q}&tbm=nws"
 
-def scrape_with_brightdata(url: str) -> str:
-    """Scrape a URL using BrightData proxy service"""
+async def _stream_headlines(client: httpx.AsyncClient, url: str, max_bytes: int, source: str) -> str:
+    """Feed a page into a headline extractor as it downloads, reading at most max_bytes of body"""
+    extractor = create_headline_extractor()
+    # One thread per page keeps parsing off the event loop and never moves an lxml parser between threads
+    parser_thread = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_running_loop()
+    received = 0
     try:
-        proxy_host = "zproxy.lum-superproxy.io"
-        proxy_port = "22225"
-        proxy_user = os.getenv("BRIGHTDATA_USER")
-        proxy_pass = os.getenv("BRIGHTDATA_PASS")
-        
-        proxy_url = f"http://{proxy_user}:{proxy_pass}@{proxy_host}:{proxy_port}"
-        
-        proxies = {
-            "http": proxy_url,
-            "https": proxy_url
-        }
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        
-        response = requests.get(url, proxies=proxies, headers=headers, timeout=30)
-        response.raise_for_status()
-        return response.text
-        
-    except requests.exceptions.RequestException as e:
-        print(f"BrightData scraping error: {str(e)}")
+        # Parsing overlaps the download, so the extraction span encloses the scrape span
+        with span("extract_headlines", parser=type(extractor).__name__):
+            with span("scrape", source=source):
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                    parsing = None
+                    async for chunk in response.aiter_bytes(PAGE_CHUNK_BYTES):
+                        chunk = chunk[:max_bytes - received]
+                        received += len(chunk)
+                        # The next chunk downloads while the previous one is parsed; never more than two are held
+                        if parsing:
+                            await parsing
+                        parsing = loop.run_in_executor(parser_thread, extractor.feed, decoder.decode(chunk))
+                        if received >= max_bytes:
+                            print(f"Page larger than {max_bytes} bytes, extracting headlines from the first part: {url}")
+                            break
+                    if parsing:
+                        await parsing
+            observe(FETCHED_BYTES, source, received)
+
+            def finish() -> str:
+                extractor.feed(decoder.decode(b"", final=True))
+                return extractor.close()
+
+            return await loop.run_in_executor(parser_thread, finish)
+    finally:
+        parser_thread.shutdown(wait=False)
+
+async def scrape_headlines_async(url: str, max_bytes: Optional[int] = None) -> Optional[str]:
+    """Scrape a results page through BrightData and extract its headlines while it streams in.
+
+    Only one chunk of the page is held at a time and at most SCRAPE_MAX_BYTES
+    of body are read, so memory per topic does not grow with the page.
+    Returns None if both the proxied and the direct fetch fail.
+    """
+    max_bytes = max_bytes or int(os.getenv("SCRAPE_MAX_BYTES", str(8 * 1024 * 1024)))
+    cache = get_cache()
+    if cache:
+        cached_headlines = await asyncio.to_thread(cache.get_text, "page_headlines", make_key(url))
+        if cached_headlines is not None:
+            print(f"Headline cache hit: {url}")
+            return cached_headlines
+
+    async def fetch_proxied() -> str:
+        async with provider_slot("brightdata"):
+            return await _stream_headlines(get_http_client(proxied=True), url, max_bytes, "brightdata")
+
+    try:
+        # Each hedged attempt parses into its own extractor; the loser is cancelled mid-stream
+        headlines = await hedged(fetch_proxied, hedge_delay("brightdata"))
+        if cache:
+            await asyncio.to_thread(cache.set_text, "page_headlines", make_key(url), headlines)
+        return headlines
+
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        if not isinstance(e, CircuitOpenError):
+            print(f"BrightData scraping error: {str(e)}")
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            return response.text
-        except:
-            return f"Error scraping {url}: {str(e)}"
+            return await _stream_headlines(get_http_client(), url, max_bytes, "direct")
+        except Exception as direct_error:
+            print(f"Direct scraping error for {url}: {str(direct_error)}")
+            return None
+
+def invalidate_headlines(topic: str) -> None:
+    """Drop a topic's cached headlines so the next scrape fetches a fresh results page"""
+    cache = get_cache()
+    if cache:
+        cache.delete("page_headlines", make_key(generate_valid_news_url(topic)))
 
 def clean_html_to_text(html_content: str) -> str:
     """Clean HTML content to plain text"""
-    soup = BeautifulSoup(html_content, "html.parser")
-    text = soup.get_text(separator="\n")
-    return text.strip()
+    from bs4 import BeautifulSoup
+
+    with span("clean_html_to_text"):
+        soup = BeautifulSoup(html_content, "html.parser")
+        text = soup.get_text(separator="\n")
+        return text.strip()
 
 def extract_headlines(cleaned_text: str) -> str:
     """Extract headlines from cleaned news text content"""
+    with span("extract_headlines", parser="text"):
+        return _extract_headlines(cleaned_text)
+
+def _extract_headlines(cleaned_text: str) -> str:
     headlines = []
     current_block = []
     
@@ -79,9 +182,108 @@ def extract_headlines(cleaned_text: str) -> str:
     
     return "\n".join(headlines)
 
-def summarize_with_gemini_news_script(api_key: str, headlines: str) -> str:
-    """Summarize headlines into a TTS-friendly broadcast news script using Gemini"""
-    system_prompt = """
+def headline_set_hash(headlines: str) -> str:
+    """Hash the set of headlines so reordered or repeated headlines share a cache entry"""
+    unique_headlines = sorted({line.strip() for line in headlines.split("\n") if line.strip()})
+    return hashlib.sha256("\n".join(unique_headlines).encode("utf-8")).hexdigest()
+
+# Chat model clients are reused across requests instead of being rebuilt per call
+_llm_clients = {}
+_llm_clients_lock = threading.Lock()
+
+def chat_model_class():
+    """The Gemini chat model class, imported on first use"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI
+
+def chat_messages(system_prompt: str, user_prompt: str) -> list:
+    from langchain_core.messages import HumanMessage, SystemMessage
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
+
+def get_llm(model: str, temperature: float, api_key: str = None):
+    """Return the pooled Gemini chat client for a model/temperature/key combination"""
+    key = (model, temperature, api_key)
+    with _llm_clients_lock:
+        llm = _llm_clients.get(key)
+        if llm is None:
+            llm = chat_model_class()(
+                model=model,
+                google_api_key=api_key,
+                temperature=temperature
+            )
+            _llm_clients[key] = llm
+        return llm
+
+def warm_up_providers() -> None:
+    """Import the provider SDKs and build the pooled clients ahead of the first request"""
+    api_key = get_settings().gemini_api_key
+    chat_model_class()
+    chat_messages("", "")
+    if api_key:
+        for model, temperature in ((NEWS_SCRIPT_MODEL, NEWS_SCRIPT_TEMPERATURE),
+                                   (BROADCAST_MODEL, BROADCAST_TEMPERATURE)):
+            get_llm(model, temperature, api_key)
+    try:
+        import elevenlabs.client  # noqa: F401
+    except ImportError:
+        pass
+
+def log_llm_call(model: str, started: float, response) -> None:
+    """Log latency and token usage of a completed LLM call"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    for direction in ("input_tokens", "output_tokens"):
+        if usage.get(direction) is not None:
+            observe(LLM_TOKENS, direction.split("_")[0], usage[direction])
+    print(
+        f"LLM call model={model} latency={time.perf_counter() - started:.2f}s "
+        f"input_tokens={usage.get('input_tokens', '?')} output_tokens={usage.get('output_tokens', '?')}"
+    )
+
+def invoke_gemini_cached(cache_namespace: str, cache_key: str, model: str, api_key: str, temperature: float,
+                         system_prompt: str, user_prompt: str) -> str:
+    """Invoke Gemini with a system and user prompt, reusing a cached response for identical inputs"""
+    cache = get_cache()
+    if cache:
+        cached_response = cache.get_text(cache_namespace, cache_key)
+        if cached_response is not None:
+            print(f"LLM cache hit ({cache_namespace})")
+            return cached_response
+
+    with provider_slot("gemini"):
+        started = time.perf_counter()
+        with span("llm", model=model, purpose=cache_namespace):
+            response = get_llm(model, temperature, api_key).invoke(
+                chat_messages(system_prompt, user_prompt)
+            )
+    log_llm_call(model, started, response)
+
+    if cache and response.content:
+        cache.set_text(cache_namespace, cache_key, response.content)
+    return response.content
+
+async def ainvoke_gemini_cached(cache_namespace: str, cache_key: str, model: str, api_key: str, temperature: float,
+                                system_prompt: str, user_prompt: str) -> str:
+    """Async variant of invoke_gemini_cached using the client's native ainvoke"""
+    cache = get_cache()
+    if cache:
+        cached_response = await asyncio.to_thread(cache.get_text, cache_namespace, cache_key)
+        if cached_response is not None:
+            print(f"LLM cache hit ({cache_namespace})")
+            return cached_response
+
+    async with provider_slot("gemini"):
+        started = time.perf_counter()
+        with span("llm", model=model, purpose=cache_namespace):
+            response = await get_llm(model, temperature, api_key).ainvoke(
+                chat_messages(system_prompt, user_prompt)
+            )
+    log_llm_call(model, started, response)
+
+    if cache and response.content:
+        await asyncio.to_thread(cache.set_text, cache_namespace, cache_key, response.content)
+    return response.content
+
+NEWS_SCRIPT_SYSTEM_PROMPT = """
 You are my personal news editor and scriptwriter for a news podcast. Your job is to turn raw headlines into a professional, broadcast-style news script.
 
 The final output will be read aloud by a news anchor or text-to-speech engine. So:
@@ -94,22 +296,111 @@ The final output will be read aloud by a news anchor or text-to-speech engine. S
 
 Remember: Your only output should be a clean script that is ready to be read out loud.
 """
+
+BATCH_NEWS_SCRIPT_SYSTEM_PROMPT = NEWS_SCRIPT_SYSTEM_PROMPT + """
+You will receive headlines for several topics at once, each under a "TOPIC:" line.
+Write a separate script for every topic and return ONLY a JSON object whose keys are
+exactly the topic names as given and whose values are the script for that topic.
+"""
+
+NEWS_SCRIPT_MODEL = "gemini-pro"
+NEWS_SCRIPT_TEMPERATURE = 0.4
+BROADCAST_MODEL = "gemini-1.5-flash"
+BROADCAST_TEMPERATURE = 0.7
+
+def news_script_key(headlines: str) -> str:
+    """Cache key for one topic's news script, shared by the per-topic and batched summary paths"""
+    return make_key(NEWS_SCRIPT_SYSTEM_PROMPT, headline_set_hash(headlines), NEWS_SCRIPT_MODEL, NEWS_SCRIPT_TEMPERATURE)
+
+def summarize_with_gemini_news_script(api_key: str, headlines: str) -> str:
+    """Summarize headlines into a TTS-friendly broadcast news script using Gemini"""
     try:
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            google_api_key=os.getenv("GEMINI_API_KEY"),
-            temperature=0.4
+        return invoke_gemini_cached(
+            cache_namespace="summary",
+            cache_key=news_script_key(headlines),
+            model=NEWS_SCRIPT_MODEL,
+            api_key=get_settings().gemini_api_key,
+            temperature=NEWS_SCRIPT_TEMPERATURE,
+            system_prompt=NEWS_SCRIPT_SYSTEM_PROMPT,
+            user_prompt=headlines
         )
-        
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=headlines)
-        ])
-        
-        return response.content
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
+async def asummarize_with_gemini_news_script(api_key: str, headlines: str) -> str:
+    """Async variant of summarize_with_gemini_news_script, sharing its cache entries"""
+    try:
+        return await ainvoke_gemini_cached(
+            cache_namespace="summary",
+            cache_key=news_script_key(headlines),
+            model=NEWS_SCRIPT_MODEL,
+            api_key=api_key or get_settings().gemini_api_key,
+            temperature=NEWS_SCRIPT_TEMPERATURE,
+            system_prompt=NEWS_SCRIPT_SYSTEM_PROMPT,
+            user_prompt=headlines
+        )
+    except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+def _parse_json_object(text: str) -> dict:
+    """Parse a JSON object from an LLM reply, tolerating markdown code fences"""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise ValueError("Expected a JSON object")
+    return parsed
+
+async def summarize_topics_with_gemini(api_key: str, headlines_by_topic: dict, mode: str = None) -> dict:
+    """Summarize several topics' headlines with as few Gemini round trips as possible.
+
+    mode "structured" sends every uncached topic in one JSON-returning call and
+    falls back to per-topic calls for anything missing from the reply; mode
+    "concurrent" issues one ainvoke per topic in parallel.
+    """
+    mode = mode or os.getenv("LLM_BATCH_MODE", "structured")
+    api_key = api_key or get_settings().gemini_api_key
+    cache = get_cache()
+    summaries = {}
+
+    # Every topic is looked up under its per-topic key, so summaries from prewarm, pipelined and digest
+    # runs are reused and only the topics that miss are batched
+    pending = {}
+    for topic, headlines in headlines_by_topic.items():
+        cached_summary = (await asyncio.to_thread(cache.get_text, "summary", news_script_key(headlines))
+                          if cache else None)
+        if cached_summary is not None:
+            summaries[topic] = cached_summary
+        else:
+            pending[topic] = headlines
+
+    if pending and mode == "structured" and len(pending) > 1:
+        user_prompt = "\n\n".join(f"TOPIC: {topic}\n{headlines}" for topic, headlines in pending.items())
+        try:
+            async with provider_slot("gemini"):
+                started = time.perf_counter()
+                with span("llm", model=NEWS_SCRIPT_MODEL, purpose="summary_batch", topics=len(pending)):
+                    response = await get_llm(NEWS_SCRIPT_MODEL, NEWS_SCRIPT_TEMPERATURE, api_key).ainvoke(
+                        chat_messages(BATCH_NEWS_SCRIPT_SYSTEM_PROMPT, user_prompt)
+                    )
+            log_llm_call(NEWS_SCRIPT_MODEL, started, response)
+
+            for topic, script in _parse_json_object(response.content).items():
+                if topic in pending and isinstance(script, str) and script.strip():
+                    summaries[topic] = script
+                    headlines = pending.pop(topic)
+                    if cache:
+                        await asyncio.to_thread(cache.set_text, "summary", news_script_key(headlines), script)
+        except Exception as e:
+            print(f"Batched summarization failed, falling back to per-topic calls: {str(e)}")
+
+    if pending:
+        results = await asyncio.gather(*(
+            asummarize_with_gemini_news_script(api_key, headlines) for headlines in pending.values()
+        ))
+        summaries.update(zip(pending.keys(), results))
+
+    return summaries
+
 def generate_news_urls_to_scrape(list_of_keywords):
     """Generate URLs for each keyword"""
     valid_urls_dict = {}
@@ -117,9 +408,7 @@ def generate_news_urls_to_scrape(list_of_keywords):
         valid_urls_dict[keyword] = generate_valid_news_url(keyword)
     return valid_urls_dict
 
-def generate_broadcast_news(api_key, news_data, reddit_data, topics):
-    """Generate a TTS-ready news script based on provided news and Reddit data"""
-    system_prompt = """
+BROADCAST_SYSTEM_PROMPT = """
 You are broadcast_news_writer, a professional virtual news reporter. Generate natural, TTS-ready news segments.
 
 For each topic, STRUCTURE BASED ON AVAILABLE DATA:
@@ -138,41 +427,72 @@ Formatting rules:
 
 Write in full paragraphs optimized for speech synthesis. Avoid markdown.
 """
-    try:
-        topic_blocks = []
-        for topic in topics:
-            news_content = news_data.get("news_analysis", {}).get(topic, "") if news_data else ""
-            reddit_content = reddit_data.get("reddit_analysis", {}).get(topic, "") if reddit_data else ""
-            context = []
-
-            if news_content:
-                context.append(f"OFFICIAL NEWS CONTENT:\n{news_content}")
-            if reddit_content:
-                context.append(f"REDDIT DISCUSSION CONTENT:\n{reddit_content}")
-
-            if context:
-                topic_blocks.append(f"TOPIC: {topic}\n" + "\n".join(context))
-
-        user_prompt = (
-            "Create broadcast segments for these topics using available sources:\n\n" +
-            "\n\n--- NEW TOPIC ---\n\n".join(topic_blocks)
-        )
 
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=api_key,
-            temperature=0.7
-        )
+def build_broadcast_prompt(news_data, reddit_data, topics) -> str:
+    """Build the broadcast writer's user prompt from the per-topic news and Reddit content"""
+    topic_blocks = []
+    for topic in topics:
+        news_content = news_data.get("news_analysis", {}).get(topic, "") if news_data else ""
+        reddit_content = reddit_data.get("reddit_analysis", {}).get(topic, "") if reddit_data else ""
+        context = []
+
+        if news_content:
+            context.append(f"OFFICIAL NEWS CONTENT:\n{news_content}")
+        if reddit_content:
+            context.append(f"REDDIT DISCUSSION CONTENT:\n{reddit_content}")
 
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ])
+        if context:
+            topic_blocks.append(f"TOPIC: {topic}\n" + "\n".join(context))
 
-        return response.content
+    return (
+        "Create broadcast segments for these topics using available sources:\n\n" +
+        "\n\n--- NEW TOPIC ---\n\n".join(topic_blocks)
+    )
+
+def generate_broadcast_news(api_key, news_data, reddit_data, topics):
+    """Generate a TTS-ready news script based on provided news and Reddit data"""
+    try:
+        user_prompt = build_broadcast_prompt(news_data, reddit_data, topics)
+        return invoke_gemini_cached(
+            cache_namespace="broadcast",
+            cache_key=make_key(BROADCAST_SYSTEM_PROMPT, user_prompt, BROADCAST_MODEL, BROADCAST_TEMPERATURE),
+            model=BROADCAST_MODEL,
+            api_key=api_key,
+            temperature=BROADCAST_TEMPERATURE,
+            system_prompt=BROADCAST_SYSTEM_PROMPT,
+            user_prompt=user_prompt
+        )
     except Exception as e:
         return f"Error generating broadcast: {str(e)}"
 
+async def astream_broadcast_news(api_key, news_data, reddit_data, topics) -> AsyncIterator[str]:
+    """Stream the broadcast script as Gemini writes it, sharing generate_broadcast_news's cache entries"""
+    user_prompt = build_broadcast_prompt(news_data, reddit_data, topics)
+    cache_key = make_key(BROADCAST_SYSTEM_PROMPT, user_prompt, BROADCAST_MODEL, BROADCAST_TEMPERATURE)
+    cache = get_cache()
+    if cache:
+        cached_script = await asyncio.to_thread(cache.get_text, "broadcast", cache_key)
+        if cached_script is not None:
+            print("LLM cache hit (broadcast)")
+            yield cached_script
+            return
+
+    parts = []
+    async with provider_slot("gemini"):
+        started = time.perf_counter()
+        with span("llm", model=BROADCAST_MODEL, purpose="broadcast_stream"):
+            async for chunk in get_llm(BROADCAST_MODEL, BROADCAST_TEMPERATURE, api_key).astream(
+                chat_messages(BROADCAST_SYSTEM_PROMPT, user_prompt)
+            ):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+    print(f"LLM stream model={BROADCAST_MODEL} latency={time.perf_counter() - started:.2f}s "
+          f"output_chars={sum(len(part) for part in parts)}")
+
+    if cache and parts:
+        await asyncio.to_thread(cache.set_text, "broadcast", cache_key, "".join(parts))
+
 def text_to_audio_elevenlabs_sdk(
     text: str,
     voice_id: str = "JBFqnCBsd6RMkJVDRzZb",
@@ -181,75 +501,77 @@ def text_to_audio_elevenlabs_sdk(
     output_dir: str = "audio",
     api_key: str = None
 ) -> str:
-    """Convert text to speech using ElevenLabs SDK with better error handling"""
+    """Convert text to speech (ElevenLabs, then gTTS) in parallel sentence-aligned chunks"""
     try:
-        # Try ElevenLabs first
-        api_key =api_key or os.getenv("ELEVENLABS_API_KEY")
-        
         print(f"Attempting ElevenLabs TTS conversion...")
         print(f"Text length: {len(text)} characters")
-        
-        # Check if text is too long (ElevenLabs has limits)
-        if len(text) > 5000:
-            text = text[:5000] + "..."
-            print("Text truncated to 5000 characters")
-        
-        # Try ElevenLabs
-        try:
-            from elevenlabs.client import ElevenLabs
-            from elevenlabs import save
-            
-            client = ElevenLabs(api_key=api_key)
-            
-            audio = client.generate(
-                text=text,
-                voice=voice_id,
-                model=model_id
-            )
-            
-            os.makedirs(output_dir, exist_ok=True)
-            
-            filename = f"tts_{uuid.uuid4().hex[:8]}.mp3"
-            filepath = os.path.join(output_dir, filename)
-            
-            save(audio, filepath)
-            print(f"ElevenLabs TTS successful: {filepath}")
+
+        audio = synthesize_text(
+            text=text,
+            voice_id=voice_id,
+            model_id=model_id,
+            output_format=output_format,
+            api_key=api_key
+        )
+
+        if audio:
+            filepath = write_audio_file(audio, output_dir, "tts")
+            print(f"TTS successful: {filepath}")
             return filepath
-            
-        except Exception as eleven_error:
-            print(f"ElevenLabs failed: {str(eleven_error)}")
-            
-            # Fallback to gTTS (Google Text-to-Speech)
-            try:
-                from gtts import gTTS
-                import io
-                
-                print("Falling back to Google TTS...")
-                
-                tts = gTTS(text=text, lang='en', slow=False)
-                
-                os.makedirs(output_dir, exist_ok=True)
-                filename = f"tts_gtts_{uuid.uuid4().hex[:8]}.mp3"
-                filepath = os.path.join(output_dir, filename)
-                
-                tts.save(filepath)
-                print(f"Google TTS successful: {filepath}")
-                return filepath
-                
-            except Exception as gtts_error:
-                print(f"Google TTS also failed: {str(gtts_error)}")
-                
-                # Last fallback - create a dummy audio file with text content
-                os.makedirs(output_dir, exist_ok=True)
-                filename = f"text_summary_{uuid.uuid4().hex[:8]}.txt"
-                filepath = os.path.join(output_dir, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(f"Audio generation failed. Here's the text summary:\n\n{text}")
-                
-                print(f"Created text file instead: {filepath}")
-                return filepath
+
+        # Last fallback - create a dummy audio file with text content
+        text_summary = f"Audio generation failed. Here's the text summary:\n\n{text}"
+        filepath = get_artifact_store(output_dir).put(text_summary.encode("utf-8"), ".txt", "text_summary")
+
+        print(f"Created text file instead: {filepath}")
+        return filepath
 
     except Exception as e:
         print(f"Complete TTS failure: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def write_audio_file(data: bytes, output_dir: str = "audio", prefix: str = "tts") -> str:
+    """Store audio bytes in the artifact store under a content-hash filename"""
+    return get_artifact_store(output_dir).put(data, ".mp3", prefix)
+
+def concatenate_audio_files(audio_paths: list, output_dir: str = "audio",
+                            resynthesize: Optional[Callable[[int], Optional[str]]] = None) -> str:
+    """Join MP3 segment files frame by frame into a single MP3, skipping non-audio fallbacks.
+
+    Every segment must match the first one's sample rate and MPEG version
+    (e.g. a gTTS fallback segment among ElevenLabs ones). A mismatched segment
+    is replaced by resynthesize(index), which returns a new audio path for
+    audio_paths[index], or dropped if that is missing or still doesn't match.
+
+    Segments are content-addressed and may be shared with other broadcasts,
+    so they are never deleted here; the artifact store's eviction reclaims them.
+    """
+    def read(path: Optional[str]) -> Optional[bytes]:
+        if not (path and path.endswith(".mp3") and os.path.exists(path)):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    audio = {index: data for index, data in enumerate(map(read, audio_paths)) if data}
+    if not audio:
+        return None
+
+    formats = {index: stream_format(data) for index, data in audio.items()}
+    expected = next((found for found in formats.values() if found), None)
+    for index, found in formats.items():
+        if found is None or found == expected:
+            continue
+        replacement = read(resynthesize(index)) if resynthesize else None
+        if replacement and stream_format(replacement) == expected:
+            print(f"Re-synthesized audio segment {index} to match {describe_format(expected)}")
+            audio[index] = replacement
+        else:
+            print(f"Dropping audio segment {index}: {describe_format(found)} "
+                  f"does not match {describe_format(expected)}")
+            del audio[index]
+
+    segments = list(audio.values())
+    filepath = write_audio_file(join_mp3(segments), output_dir, "tts")
+
+    print(f"Concatenated {len(segments)} audio segments: {filepath}")
+    return filepath